@@ -1,33 +1,82 @@
 import json
 import os
-import re
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
 from pathlib import Path
 
-import requests
+from requests import HTTPError
 
+try:
+    import orjson
 
-EMAIL_PATTERN = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    _loads = orjson.loads
+except ImportError:  # orjson is an optional speedup; the stdlib handles the same payloads
+    _dumps = json.dumps
+    _loads = json.loads
+
+try:
+    # RE2 matches in linear time, so crafted input cannot trigger backtracking blowups.
+    import re2 as _re
+except ImportError:
+    import re as _re
+
+
+EMAIL_PATTERN = _re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+# Lower-cased data classes used by _severity_from_data_types
+_HIGH_FINANCIAL = frozenset({"financial info", "credit cards", "bank account", "social security number"})
+_HIGH_CREDENTIALS = frozenset({"password", "passwords", "hashes"})
+_EMAIL_ONLY = frozenset({"emailaddresses", "email addresses"})
+
+_SIMULATED_DATA_PATH = Path(__file__).resolve().parents[1] / "data" / "simulated_breaches.json"
+# Parsed simulated breaches keyed by email, invalidated by the file's mtime.
+_SIM_CACHE: dict = {"mtime": None, "data": None}
+
+# Live HIBP lookups: concurrent callers for one email share a single upstream
+# request, and its result is reused for a short while afterwards.
+_HIBP_INFLIGHT: dict[str, Future] = {}
+_HIBP_RECENT: dict[str, tuple[float, list[dict]]] = {}
+_HIBP_LOCK = threading.Lock()
+_HIBP_RECENT_SECONDS = 60
+_HIBP_RECENT_MAX = 10_000
+_HIBP_WAIT_SECONDS = 15
 
 
 def validate_email(email: str) -> str:
     normalized = (email or "").strip().lower()
+    # Cheap structural checks reject most malformed input before the regex runs.
+    if not 5 <= len(normalized) <= 254:
+        raise ValueError("Invalid email format")
+    at_idx = normalized.find("@")
+    if at_idx < 1 or at_idx == len(normalized) - 1 or normalized.find("@", at_idx + 1) != -1:
+        raise ValueError("Invalid email format")
+    if "." not in normalized[at_idx + 1:]:
+        raise ValueError("Invalid email format")
     if not EMAIL_PATTERN.match(normalized):
         raise ValueError("Invalid email format")
     return normalized
 
 
-def _severity_from_data_types(data_exposed: list[str]) -> str:
-    values = {item.lower() for item in data_exposed}
-    if any(k in values for k in ["financial info", "credit cards", "bank account", "social security number"]):
-        return "High"
-    if any(k in values for k in ["password", "passwords", "hashes"]):
+@lru_cache(maxsize=1024)
+def _severity_for_classes(data_classes: tuple[str, ...]) -> str:
+    values = frozenset(item.lower() for item in data_classes)
+    if values & _HIGH_FINANCIAL or values & _HIGH_CREDENTIALS:
         return "High"
-    if "emailAddresses" in values or "email addresses" in values:
-        if len(values) == 1:
-            return "Low"
+    if len(values) == 1 and values & _EMAIL_ONLY:
+        return "Low"
     return "Medium"
 
 
+def _severity_from_data_types(data_exposed: list[str]) -> str:
+    # The same breach (and so the same data-class list) recurs across emails and sweeps.
+    return _severity_for_classes(tuple(data_exposed))
+
+
 def _normalize_hibp_record(item: dict) -> dict:
     data_exposed = item.get("DataClasses") or ["Email Addresses"]
     return {
@@ -38,22 +87,36 @@ def _normalize_hibp_record(item: dict) -> dict:
     }
 
 
+def _read_simulated_breaches() -> dict[str, list[dict]]:
+    """Return simulated breaches normalized per email, re-reading the file only when it changes."""
+    try:
+        mtime = _SIMULATED_DATA_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    if mtime != _SIM_CACHE["mtime"] or _SIM_CACHE["data"] is None:
+        by_email: dict[str, list[dict]] = {}
+        if mtime is not None:
+            payload = _loads(_SIMULATED_DATA_PATH.read_bytes())
+            for email, items in payload.get("breaches", {}).items():
+                breaches = []
+                for record in items:
+                    data = record.get("data_exposed", ["Email Addresses", "Passwords"])
+                    breaches.append({
+                        "name": record.get("name", "Unknown"),
+                        "breach_date": record.get("breach_date", "2020-01-01"),
+                        "data_exposed": data,
+                        "severity": _severity_from_data_types(data),
+                    })
+                by_email[email] = breaches
+        _SIM_CACHE["data"] = by_email
+        _SIM_CACHE["mtime"] = mtime
+
+    return _SIM_CACHE["data"]
+
+
 def _load_simulated_data(email: str) -> list[dict]:
-    project_root = Path(__file__).resolve().parents[1]
-    data_path = project_root / "data" / "simulated_breaches.json"
-    
-    breaches = []
-    if data_path.exists():
-        payload = json.loads(data_path.read_text(encoding="utf-8"))
-        items = payload.get("breaches", {}).get(email, [])
-        for record in items:
-            data = record.get("data_exposed", ["Email Addresses", "Passwords"])
-            breaches.append({
-                "name": record.get("name", "Unknown"),
-                "breach_date": record.get("breach_date", "2020-01-01"),
-                "data_exposed": data,
-                "severity": _severity_from_data_types(data),
-            })
+    breaches = list(_read_simulated_breaches().get(email, []))
     
     # If no simulated data found for this specific email, but simulation is ON, 
     # we provide a generic "RailYatri" simulated breach to ensure the UI works.
@@ -69,14 +132,26 @@ def _load_simulated_data(email: str) -> list[dict]:
     return breaches
 
 
+def _hibp_session():
+    """Return the process-wide pooled HIBP session, shared with hibp_service."""
+    from execution.hibp_service import http_session
+
+    return http_session()
+
+
 def _fetch_hibp(email: str) -> list[dict]:
+    from execution.hibp_service import wait_for_request_slot
+
     api_key = os.getenv("HIBP_API_KEY", "").strip()
     user_agent = os.getenv("HIBP_USER_AGENT", "DarkWebBreachMonitor/1.0")
     if not api_key:
         raise RuntimeError("HIBP_API_KEY is not configured")
 
     url = f"https://haveibeenpwned.com/api/v3/breachedaccount/{email}"
-    response = requests.get(
+    # Same global spacing as the scan path, so concurrent checks cannot burst HIBP.
+    wait_for_request_slot()
+    # Credentials come from the environment at call time (.env is loaded after import).
+    response = _hibp_session().get(
         url,
         params={"truncateResponse": "false"},
         headers={"hibp-api-key": api_key, "user-agent": user_agent},
@@ -91,6 +166,48 @@ def _fetch_hibp(email: str) -> list[dict]:
     return [_normalize_hibp_record(item) for item in records]
 
 
+def _fetch_hibp_shared(email: str) -> list[dict]:
+    """_fetch_hibp with in-flight deduplication and a short result cache."""
+    with _HIBP_LOCK:
+        recent = _HIBP_RECENT.get(email)
+        if recent is not None and recent[0] > time.monotonic():
+            return list(recent[1])
+        future = _HIBP_INFLIGHT.get(email)
+        leader = future is None
+        if leader:
+            future = Future()
+            _HIBP_INFLIGHT[email] = future
+
+    if not leader:
+        return list(future.result(timeout=_HIBP_WAIT_SECONDS))
+
+    try:
+        breaches = _fetch_hibp(email)
+    except BaseException as exc:
+        with _HIBP_LOCK:
+            _HIBP_INFLIGHT.pop(email, None)
+        future.set_exception(exc)
+        raise
+
+    now = time.monotonic()
+    with _HIBP_LOCK:
+        # Publish the cached result before retiring the in-flight entry, so no
+        # caller slips in between and starts a second upstream request.
+        if len(_HIBP_RECENT) >= _HIBP_RECENT_MAX:
+            for key in [key for key, (expires_at, _) in _HIBP_RECENT.items() if expires_at <= now]:
+                del _HIBP_RECENT[key]
+        if len(_HIBP_RECENT) < _HIBP_RECENT_MAX:
+            _HIBP_RECENT[email] = (now + _HIBP_RECENT_SECONDS, breaches)
+        _HIBP_INFLIGHT.pop(email, None)
+    future.set_result(breaches)
+    return list(breaches)
+
+
+def _is_transient_hibp_error(exc: Exception) -> bool:
+    response = getattr(exc, "response", None) if isinstance(exc, HTTPError) else None
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
+
 def run_breach_check(email: str) -> dict:
     normalized_email = validate_email(email)
     use_simulated = os.getenv("USE_SIMULATED_DATA", "true").strip().lower() == "true"
@@ -100,8 +217,12 @@ def run_breach_check(email: str) -> dict:
         breaches = _load_simulated_data(normalized_email)
     else:
         try:
-            breaches = _fetch_hibp(normalized_email)
-        except Exception:
+            breaches = _fetch_hibp_shared(normalized_email)
+        except Exception as exc:
+            # A rate limit or HIBP outage says nothing about the account; raise
+            # rather than let simulated breaches be stored and alerted on as real.
+            if _is_transient_hibp_error(exc):
+                raise
             breaches = _load_simulated_data(normalized_email)
 
     return {
@@ -1,17 +1,8 @@
-from datetime import datetime
-
-from execution.event_log_and_alert_service import latest_alert_banner, latest_check_payload
-
-
-def _parse_date(value: str):
-    try:
-        return datetime.fromisoformat(value)
-    except Exception:
-        return datetime.min
+from execution.event_log_and_alert_service import latest_dashboard_state, latest_dashboard_version
 
 
 def build_dashboard_payload(email: str) -> dict:
-    payload = latest_check_payload(email)
+    payload, show_alert_banner = latest_dashboard_state(email)
     if not payload:
         return {
             "email": email,
@@ -25,9 +16,8 @@ def build_dashboard_payload(email: str) -> dict:
         }
 
     breaches = payload.get("breaches", [])
-    recent = None
-    if breaches:
-        recent = sorted(breaches, key=lambda item: _parse_date(item.get("breach_date", "")), reverse=True)[0]
+    # ISO-8601 dates compare lexicographically in chronological order.
+    recent = max(breaches, key=lambda item: item.get("breach_date") or "") if breaches else None
 
     return {
         "email": payload.get("email", email),
@@ -37,5 +27,10 @@ def build_dashboard_payload(email: str) -> dict:
         "most_recent_breach": recent,
         "breaches": breaches,
         "recommendations": payload.get("recommendations", []),
-        "show_alert_banner": latest_alert_banner(payload.get("email", email)),
+        "show_alert_banner": show_alert_banner,
     }
+
+
+def dashboard_version(email: str) -> str:
+    """Cheap token that changes whenever build_dashboard_payload(email) would."""
+    return latest_dashboard_version(email)
@@ -4,12 +4,17 @@ Uses Gmail SMTP with app password authentication.
 """
 import logging
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+import threading
+import time
+
+from execution.email_templates import build_breach_alert_html
 
 logger = logging.getLogger(__name__)
 
+# Per-thread SMTP session reused across alerts instead of a TLS handshake per email
+_smtp_pool = threading.local()
+_SMTP_IDLE_SECONDS = 60  # Probe idle connections with NOOP before reusing them
+
 
 def _get_email_config() -> dict:
     """Get email configuration from environment variables."""
@@ -21,102 +26,75 @@ def _get_email_config() -> dict:
     }
 
 
-def _build_alert_html(user_email: str, monitored_email: str, breaches: list) -> str:
-    """Build HTML email body for breach alert with absolute white contrast."""
-    breach_rows = ""
-    for breach in breaches:
-        if isinstance(breach, str):
-            name = breach
-            if name.lower() == 'railyatri':
-                data_exposed = "Email addresses, Genders, Names, Phone numbers, Purchases"
-            else:
-                data_exposed = "Email addresses, Passwords"
-            date = "2021-03-12"
-            severity = "High"
-        else:
-            name = breach.get('name', 'Unknown')
-            date = breach.get('breach_date', '2021-03-12')
-            severity = breach.get('severity', 'High')
-            data_exposed = ", ".join(breach.get("data_exposed", [])) or "Email Addresses, Passwords"
-        
-        breach_rows += f"""
-        <tr style="border-bottom: 1px solid #444;">
-            <td style="padding: 15px; color: #ffffff !important; font-weight: bold; font-size: 14px;">{name}</td>
-            <td style="padding: 15px; color: #ffffff !important; font-size: 13px;">{date}</td>
-            <td style="padding: 15px; color: #ffffff !important; font-size: 13px;">{severity}</td>
-            <td style="padding: 15px; color: #ffffff !important; font-family: 'Courier New', monospace; font-size: 13px; font-weight: bold;">{data_exposed}</td>
-        </tr>
-        """
-
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-    </head>
-    <body style="background-color: #000000; color: #ffffff; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; padding: 20px; margin: 0;">
-        <div style="max-width: 600px; margin: 0 auto; background-color: #0d1117; border: 1px solid #30363d; border-radius: 12px; overflow: hidden; box-shadow: 0 10px 30px rgba(0,0,0,0.5);">
-            <!-- Header -->
-            <div style="background: linear-gradient(135deg, #1f6feb 0%, #238636 100%); padding: 30px; text-align: center;">
-                <h1 style="margin: 0; color: #ffffff !important; font-size: 32px; font-weight: 800; letter-spacing: 2px;">SENTINELX</h1>
-                <p style="margin: 5px 0 0 0; color: #ffffff !important; opacity: 1; font-size: 14px; text-transform: uppercase; letter-spacing: 1px;">Dark Web Breach Monitor</p>
-            </div>
-            
-            <!-- Body -->
-            <div style="padding: 40px;">
-                <div style="background-color: #da3633; color: #ffffff !important; padding: 12px 20px; border-radius: 6px; display: inline-block; font-weight: bold; margin-bottom: 25px;">
-                    🚨 <span style="color: #ffffff !important;">SECURITY ALERT</span>
-                </div>
-                
-                <p style="font-size: 17px; line-height: 1.6; color: #ffffff !important; margin-bottom: 20px;">
-                    Hello,
-                </p>
-                
-                <p style="font-size: 18px; line-height: 1.6; color: #ffffff !important; margin-bottom: 20px;">
-                    Our systems detected that <strong style="color: #ffffff !important;">{monitored_email}</strong> has been involved in <strong style="color: #ffffff !important;">{len(breaches)}</strong> security breach{'es' if len(breaches) > 1 else ''}.
-                </p>
-                
-                <h3 style="color: #ffffff !important; font-size: 18px; border-bottom: 1px solid #30363d; padding-bottom: 10px; margin-top: 35px;">Breach Details:</h3>
-                <table style="width: 100%; border-collapse: collapse; margin-top: 15px;">
-                    <thead>
-                        <tr style="text-align: left; background-color: #161b22;">
-                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Source</th>
-                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Breached Date</th>
-                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Severity</th>
-                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Compromised Data Categories</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {breach_rows}
-                    </tbody>
-                </table>
-                
-                <div style="margin: 40px 0; padding: 25px; background-color: #2386361a; border-left: 4px solid #238636; border-radius: 0 8px 8px 0;">
-                    <h4 style="margin: 0 0 10px 0; color: #ffffff !important; font-size: 18px;">🛡️ <span style="color: #ffffff !important;">Remediation plan:</span></h4>
-                    <ul style="margin: 0; padding-left: 20px; color: #ffffff !important; font-size: 15px; line-height: 1.8;">
-                        <li style="color: #ffffff !important;">Change your password immediately on affected services</li>
-                        <li style="color: #ffffff !important;">Enable Two-Factor Authentication (2FA) wherever possible</li>
-                        <li style="color: #ffffff !important;">Monitor your financial accounts for suspicious activity</li>
-                        <li style="color: #ffffff !important;">Be cautious of phishing emails attempting to exploit this breach</li>
-                        <li style="color: #ffffff !important;">Consider using a password manager with unique passwords</li>
-                    </ul>
-                </div>
-                
-                <div style="text-align: center; margin-top: 40px;">
-                    <a href="http://127.0.0.1:5000" style="background-color: #238636; color: #ffffff !important; padding: 18px 35px; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; display: inline-block;">Secure My Account</a>
-                </div>
-            </div>
-            
-            <!-- Footer -->
-            <div style="background-color: #010409; padding: 25px; text-align: center; border-top: 1px solid #30363d;">
-                <p style="margin: 0; font-size: 12px; color: #ffffff !important; font-weight: bold;">This alert was sent by Dark Web Breach Monitor.</p>
-                <p style="margin: 8px 0 0 0; font-size: 11px; color: #ffffff !important;">You received this because <span style="color: #ffffff !important;">{monitored_email}</span> is on your monitoring list.</p>
-                <p style="margin: 15px 0 0 0; font-size: 10px; color: #ffffff !important; opacity: 0.6;">&copy; 2026 SentinelX Terminal. All rights reserved.</p>
-            </div>
-        </div>
-    </body>
-    </html>
+def _close_smtp(server) -> None:
+    """Close an SMTP connection, ignoring errors from an already-dead socket."""
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def _get_smtp(host: str, port: int, username: str, password: str, timeout: float):
+    """Return this thread's pooled SMTP connection, opening or refreshing it as needed."""
+    import smtplib
+
+    key = (host, port, username)
+    server = getattr(_smtp_pool, "conn", None)
+
+    if server is not None and _smtp_pool.key != key:
+        _close_smtp(server)
+        server = None
+
+    if server is not None and time.monotonic() - _smtp_pool.last_used > _SMTP_IDLE_SECONDS:
+        try:
+            alive = server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            alive = False
+        if not alive:
+            _close_smtp(server)
+            server = None
+
+    if server is None:
+        _smtp_pool.conn = None
+        server = smtplib.SMTP(host, port, timeout=timeout)
+        try:
+            server.starttls()
+            if username and password:
+                server.login(username, password)
+        except Exception:
+            # e.g. a wrong password: don't leak the connected socket on every alert
+            _close_smtp(server)
+            raise
+        _smtp_pool.conn = server
+        _smtp_pool.key = key
+        _smtp_pool.last_used = time.monotonic()
+
+    return server
+
+
+def send_pooled_message(msg, host: str, port: int, username: str, password: str, timeout: float = 30) -> None:
+    """
+    Send a message over the pooled SMTP connection for the current thread.
+
+    Reconnects once if the server dropped the cached connection; any other
+    SMTP error propagates to the caller.
     """
+    import smtplib
+
+    for attempt in range(2):
+        server = _get_smtp(host, port, username, password, timeout)
+        try:
+            server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError):
+            _smtp_pool.conn = None
+            if attempt:
+                raise
+            continue
+        _smtp_pool.last_used = time.monotonic()
+        return
 
 
 def send_alert_email(user_email: str, monitored_email: str, breaches: list) -> bool:
@@ -131,6 +109,11 @@ def send_alert_email(user_email: str, monitored_email: str, breaches: list) -> b
     Returns:
         True if email sent successfully, False otherwise
     """
+    # SMTP/MIME modules are only needed once an alert is actually sent
+    import smtplib
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     config = _get_email_config()
     
     if not config["sender_email"] or not config["app_password"]:
@@ -148,7 +131,7 @@ def send_alert_email(user_email: str, monitored_email: str, breaches: list) -> b
         msg["To"] = user_email
         
         # Plain text fallback
-        plain_text = f"""
+        plain_parts = [f"""
 SECURITY ALERT - Dark Web Breach Monitor
 
 Data breach detected for: {monitored_email}
@@ -157,7 +140,7 @@ Number of breaches: {len(breaches)}
 
 Breach Details:
 Source\tDate\tSeverity\tData Exposed
-"""
+"""]
         for breach in breaches:
             if isinstance(breach, str):
                 name = breach
@@ -165,7 +148,7 @@ Source\tDate\tSeverity\tData Exposed
                     data = "Email addresses, Genders, Names, Phone numbers, Purchases"
                 else:
                     data = "Email addresses, Passwords"
-                plain_text += f"{name}\t2021-03-20\tHigh\t{data}\n"
+                plain_parts.append(f"{name}\t2021-03-20\tHigh\t{data}\n")
             else:
                 name = breach.get('name', 'Unknown')
                 date = breach.get('breach_date') or '2021-03-20'
@@ -179,36 +162,41 @@ Source\tDate\tSeverity\tData Exposed
                 else:
                     data = ", ".join(data_list) or "Email addresses, Passwords"
                 
-                plain_text += f"{name}\t{date}\t{severity}\t{data}\n"
+                plain_parts.append(f"{name}\t{date}\t{severity}\t{data}\n")
         
-        plain_text += """
+        plain_parts.append("""
 Remediation plan:
 - Change your password immediately
 - Enable Two-Factor Authentication
 - Monitor your accounts for suspicious activity
 
 This alert was sent by SentinelX Dark Web Breach Monitor.
-"""
+""")
+        plain_text = "".join(plain_parts)
         
-        html_content = _build_alert_html(user_email, monitored_email, breaches)
+        html_content = build_breach_alert_html(monitored_email, breaches)
         
         msg.attach(MIMEText(plain_text, "plain"))
         msg.attach(MIMEText(html_content, "html"))
         
-        with smtplib.SMTP(config["smtp_host"], config["smtp_port"], timeout=30) as server:
-            server.starttls()
-            server.login(config["sender_email"], config["app_password"])
-            server.send_message(msg)
+        send_pooled_message(
+            msg,
+            config["smtp_host"],
+            config["smtp_port"],
+            config["sender_email"],
+            config["app_password"],
+            timeout=30,
+        )
         
-        logger.info(f"Alert email sent to {user_email} for breach on {monitored_email}")
+        logger.info("Alert email sent to %s for breach on %s", user_email, monitored_email)
         return True
         
     except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"SMTP authentication failed: {e}")
+        logger.error("SMTP authentication failed: %s", e)
         return False
     except smtplib.SMTPException as e:
-        logger.error(f"SMTP error sending email: {e}")
+        logger.error("SMTP error sending email: %s", e)
         return False
     except Exception as e:
-        logger.error(f"Failed to send alert email: {e}")
+        logger.error("Failed to send alert email: %s", e)
         return False
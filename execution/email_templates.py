@@ -0,0 +1,180 @@
+"""
+HTML body for breach alert emails.
+Shared by user alerts (email_service) and monitoring-cycle alerts (event_log_and_alert_service).
+"""
+from string import Template
+from typing import Sequence
+
+_RAILYATRI_DATA = "Email addresses, Genders, Names, Phone numbers, Purchases"
+_DEFAULT_DATA = "Email addresses, Passwords"
+_FALLBACK_DATE = "2021-03-12"
+
+# Static markup is assembled once at import; only the placeholders are filled per alert.
+_HEADER_TEMPLATE = Template("""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+    </head>
+    <body style="background-color: #000000; color: #ffffff; font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; padding: 20px; margin: 0;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #0d1117; border: 1px solid #30363d; border-radius: 12px; overflow: hidden; box-shadow: 0 10px 30px rgba(0,0,0,0.5);">
+            <!-- Header -->
+            <div style="background: linear-gradient(135deg, #1f6feb 0%, #238636 100%); padding: 30px; text-align: center;">
+                <h1 style="margin: 0; color: #ffffff !important; font-size: 32px; font-weight: 800; letter-spacing: 2px;">SENTINELX</h1>
+                <p style="margin: 5px 0 0 0; color: #ffffff !important; opacity: 1; font-size: 14px; text-transform: uppercase; letter-spacing: 1px;">$subtitle</p>
+            </div>
+            
+            <!-- Body -->
+            <div style="padding: 40px;">
+                <div style="background-color: #da3633; color: #ffffff !important; padding: 12px 20px; border-radius: 6px; display: inline-block; font-weight: bold; margin-bottom: 25px;">
+                    🚨 <span style="color: #ffffff !important;">$badge</span>
+                </div>
+                
+                <p style="font-size: 17px; line-height: 1.6; color: #ffffff !important; margin-bottom: 20px;">
+                    Hello,
+                </p>
+                
+""")
+
+_HEADER = {
+    False: _HEADER_TEMPLATE.substitute(subtitle="Dark Web Breach Monitor", badge="SECURITY ALERT"),
+    True: _HEADER_TEMPLATE.substitute(subtitle="Security Alert System", badge="CRITICAL SECURITY WARNING"),
+}
+
+_INTRO = {
+    False: Template("""                <p style="font-size: 18px; line-height: 1.6; color: #ffffff !important; margin-bottom: 20px;">
+                    Our systems detected that <strong style="color: #ffffff !important;">$monitored_email</strong> has been involved in <strong style="color: #ffffff !important;">$count</strong> security breach$plural.
+                </p>
+                
+"""),
+    True: Template("""                <p style="font-size: 18px; line-height: 1.6; color: #ffffff !important; margin-bottom: 20px;">
+                    Our monitoring system has detected your credentials in <strong><span style="color: #ffffff !important;">$count</span></strong> new security breach$plural.
+                </p>
+                
+                <div style="background-color: #161b22; border: 1px solid #30363d; border-radius: 8px; padding: 20px; margin: 25px 0;">
+                    <p style="margin: 0; font-size: 15px; color: #ffffff !important;">Target Account:</p>
+                    <p style="margin: 5px 0 0 0; font-size: 18px; color: #ffffff !important; font-weight: bold;">$monitored_email</p>
+                </div>
+"""),
+}
+
+_TABLE_OPEN = """                <h3 style="color: #ffffff !important; font-size: 18px; border-bottom: 1px solid #30363d; padding-bottom: 10px; margin-top: 35px;">Breach Details:</h3>
+                <table style="width: 100%; border-collapse: collapse; margin-top: 15px;">
+                    <thead>
+                        <tr style="text-align: left; background-color: #161b22;">
+                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Source</th>
+                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Breached Date</th>
+                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Severity</th>
+                            <th style="padding: 12px; font-size: 12px; color: #ffffff !important; text-transform: uppercase;">Compromised Data Categories</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+"""
+
+_ROW = Template("""
+        <tr style="border-bottom: 1px solid #444;">
+            <td style="padding: 15px; color: #ffffff !important; font-weight: bold; font-size: 14px;">$name</td>
+            <td style="padding: 15px; color: #ffffff !important; font-size: 13px;">$date</td>
+            <td style="padding: 15px; color: #ffffff !important; font-size: 13px;">$severity</td>
+            <td style="padding: 15px; color: #ffffff !important; font-family: 'Courier New', monospace; font-size: 13px; font-weight: bold;">$data_exposed</td>
+        </tr>
+        """)
+
+_TABLE_CLOSE = """                    </tbody>
+                </table>
+                
+"""
+
+_REMEDIATION_BLOCK = {
+    False: """                <div style="margin: 40px 0; padding: 25px; background-color: #2386361a; border-left: 4px solid #238636; border-radius: 0 8px 8px 0;">
+                    <h4 style="margin: 0 0 10px 0; color: #ffffff !important; font-size: 18px;">🛡️ <span style="color: #ffffff !important;">Remediation plan:</span></h4>
+                    <ul style="margin: 0; padding-left: 20px; color: #ffffff !important; font-size: 15px; line-height: 1.8;">
+                        <li style="color: #ffffff !important;">Change your password immediately on affected services</li>
+                        <li style="color: #ffffff !important;">Enable Two-Factor Authentication (2FA) wherever possible</li>
+                        <li style="color: #ffffff !important;">Monitor your financial accounts for suspicious activity</li>
+                        <li style="color: #ffffff !important;">Be cautious of phishing emails attempting to exploit this breach</li>
+                        <li style="color: #ffffff !important;">Consider using a password manager with unique passwords</li>
+                    </ul>
+                </div>
+                
+                <div style="text-align: center; margin-top: 40px;">
+                    <a href="http://127.0.0.1:5000" style="background-color: #238636; color: #ffffff !important; padding: 18px 35px; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; display: inline-block;">Secure My Account</a>
+                </div>
+""",
+    True: """                <div style="margin: 40px 0; padding: 25px; background-color: #2386361a; border-left: 4px solid #238636; border-radius: 0 8px 8px 0;">
+                    <h4 style="margin: 0 0 10px 0; color: #ffffff !important; font-size: 18px;">🛡️ <span style="color: #ffffff !important;">Remediation plan:</span></h4>
+                    <ul style="margin: 0; padding-left: 20px; color: #ffffff !important; font-size: 15px; line-height: 1.8;">
+                        <li style="color: #ffffff !important;">Change your password immediately for all affected services.</li>
+                        <li style="color: #ffffff !important;">Enable Multi-Factor Authentication (MFA) where available.</li>
+                        <li style="color: #ffffff !important;">Monitor your financial accounts for unauthorized activity.</li>
+                        <li style="color: #ffffff !important;">Be cautious of phishing emails attempting to exploit this breach</li>
+                        <li style="color: #ffffff !important;">Consider using a password manager with unique passwords</li>
+                    </ul>
+                </div>
+                
+                <div style="text-align: center; margin-top: 40px;">
+                    <a href="http://127.0.0.1:5000" style="background-color: #238636; color: #ffffff !important; padding: 18px 35px; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; display: inline-block;">Secure My Dashboard</a>
+                </div>
+""",
+}
+
+_FOOTER = {
+    False: Template("""            </div>
+            
+            <!-- Footer -->
+            <div style="background-color: #010409; padding: 25px; text-align: center; border-top: 1px solid #30363d;">
+                <p style="margin: 0; font-size: 12px; color: #ffffff !important; font-weight: bold;">This alert was sent by Dark Web Breach Monitor.</p>
+                <p style="margin: 8px 0 0 0; font-size: 11px; color: #ffffff !important;">You received this because <span style="color: #ffffff !important;">$monitored_email</span> is on your monitoring list.</p>
+                <p style="margin: 15px 0 0 0; font-size: 10px; color: #ffffff !important; opacity: 0.6;">&copy; 2026 SentinelX Terminal. All rights reserved.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """),
+    True: Template("""            </div>
+            
+            <!-- Footer -->
+            <div style="background-color: #010409; padding: 25px; text-align: center; border-top: 1px solid #30363d;">
+                <p style="margin: 0; font-size: 12px; color: #ffffff !important;">&copy; 2026 SentinelX Terminal. All rights reserved.</p>
+                <p style="margin: 8px 0 0 0; font-size: 11px; color: #ffffff !important;">This is an automated security notification. Please do not reply.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """),
+}
+
+
+def _row_fields(breach) -> dict:
+    """Normalize a breach name (str) or breach detail (dict) into table cell values."""
+    if isinstance(breach, str):
+        data_exposed = _RAILYATRI_DATA if breach.lower() == "railyatri" else _DEFAULT_DATA
+        return {"name": breach, "date": _FALLBACK_DATE, "severity": "High", "data_exposed": data_exposed}
+    return {
+        "name": breach.get("name", "Unknown"),
+        "date": breach.get("breach_date", _FALLBACK_DATE),
+        "severity": breach.get("severity", "High"),
+        "data_exposed": ", ".join(breach.get("data_exposed", [])) or "Email Addresses, Passwords",
+    }
+
+
+def build_breach_alert_html(monitored_email: str, breaches: Sequence, critical: bool = False) -> str:
+    """
+    Build the HTML alert body.
+
+    Args:
+        monitored_email: The email that was breached
+        breaches: Breach names (strings) or breach details (dicts)
+        critical: Use the monitoring-cycle "critical warning" wording instead of the user alert wording
+
+    Returns:
+        Complete HTML document as a string
+    """
+    count = len(breaches)
+    fields = {"monitored_email": monitored_email, "count": count, "plural": "es" if count > 1 else ""}
+    parts = [_HEADER[critical], _INTRO[critical].substitute(fields), _TABLE_OPEN]
+    parts.extend(_ROW.substitute(_row_fields(breach)) for breach in breaches)
+    parts.append(_TABLE_CLOSE)
+    parts.append(_REMEDIATION_BLOCK[critical])
+    parts.append(_FOOTER[critical].substitute(fields))
+    return "".join(parts)
@@ -1,10 +1,17 @@
+import hashlib
 import json
 import logging
 import os
+import threading
+import time
+from collections.abc import Iterator
+from functools import lru_cache
 from datetime import datetime, timezone
 
 import firebase_admin
 from firebase_admin import auth, credentials, firestore
+from google.api_core.exceptions import FailedPrecondition, NotFound
+from google.cloud.firestore_v1.base_query import FieldFilter
 
 from execution.breach_check_service import validate_email
 
@@ -15,17 +22,62 @@ def _utc_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+class _TTLCache:
+    """Small thread-safe map whose entries expire individually."""
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self._maxsize and key not in self._entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                if len(self._entries) >= self._maxsize:
+                    # Still full: drop the oldest insertion
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (now + ttl, value)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# Decoded ID tokens, keyed by a digest of the token and kept until min(5 min, exp).
+_TOKEN_CACHE = _TTLCache(maxsize=10_000)
+_TOKEN_CACHE_SECONDS = 300
+# Profiles are deliberately not cached across requests: with several server
+# workers, an add or remove on one would leave the others serving stale
+# monitoredEmails. require_auth passes the profile along within a request.
+
+
+@lru_cache(maxsize=1)
 def _initialize_firebase_app() -> firebase_admin.App:
     try:
         app = firebase_admin.get_app()
-        logger.info(f"[FIREBASE] Using existing app, project: {app.project_id}")
+        logger.info("[FIREBASE] Using existing app, project: %s", app.project_id)
         return app
     except ValueError:
         service_account_path = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "").strip()
         service_account_json = os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON", "").strip()
         project_id = os.getenv("FIREBASE_PROJECT_ID", "").strip() or None
 
-        logger.info(f"[FIREBASE] Initializing app, service_account_path={service_account_path}")
+        logger.info("[FIREBASE] Initializing app, service_account_path=%s", service_account_path)
         
         cred = None
         if service_account_path:
@@ -44,48 +96,69 @@ def _initialize_firebase_app() -> firebase_admin.App:
 
         options = {"projectId": project_id} if project_id else None
         app = firebase_admin.initialize_app(cred, options)
-        logger.info(f"[FIREBASE] App initialized, project: {app.project_id}")
+        logger.info("[FIREBASE] App initialized, project: %s", app.project_id)
         return app
 
 
+# The app, client and collection handles are built once per process; failures
+# are not cached, so a misconfigured first call can be retried after fixing env.
+@lru_cache(maxsize=1)
 def _firestore_client() -> firestore.Client:
     app = _initialize_firebase_app()
     return firestore.client(app=app)
 
 
+@lru_cache(maxsize=1)
+def _users_collection():
+    return _firestore_client().collection("users")
+
+
 def _user_doc_ref(uid: str):
     if not uid:
         raise ValueError("Missing uid")
-    return _firestore_client().collection("users").document(uid)
+    return _users_collection().document(uid)
 
 
 def verify_bearer_token(authorization_header: str) -> dict:
     if not authorization_header:
         raise ValueError("Missing Authorization header")
 
-    parts = authorization_header.strip().split(" ", 1)
-    if len(parts) != 2 or parts[0].lower() != "bearer" or not parts[1].strip():
+    header = authorization_header.strip()
+    token = header[7:].strip()
+    if header[:7].lower() != "bearer " or not token:
         raise ValueError("Authorization header must be in format: Bearer <token>")
 
-    token = parts[1].strip()
-    logger.info(f"[TOKEN] Token length: {len(token)}")
-    logger.info(f"[TOKEN] Token prefix: {token[:50]}...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[TOKEN] Token length: %s", len(token))
+        logger.debug("[TOKEN] Token prefix: %s...", token[:50])
+    
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _TOKEN_CACHE.get(cache_key)
+    if cached is not None:
+        return dict(cached)
     
     _initialize_firebase_app()
     
     try:
         # Allow up to 10 seconds of clock skew between local machine and Google servers
         decoded = auth.verify_id_token(token, clock_skew_seconds=10)
-        logger.info(f"[TOKEN] Verified! aud={decoded.get('aud')}, iss={decoded.get('iss')}")
-        logger.info(f"[TOKEN] uid={decoded.get('uid')}, email={decoded.get('email')}")
+        logger.info("[TOKEN] Verified! aud=%s, iss=%s", decoded.get('aud'), decoded.get('iss'))
+        logger.info("[TOKEN] uid=%s, email=%s", decoded.get('uid'), decoded.get('email'))
+        # Never serve a cached token past its own expiry
+        expires_in = decoded.get("exp", 0) - time.time()
+        _TOKEN_CACHE.set(cache_key, dict(decoded), min(_TOKEN_CACHE_SECONDS, expires_in))
         return decoded
     except Exception as e:
-        logger.error(f"[TOKEN] Verification FAILED: {type(e).__name__}: {e}")
+        logger.error("[TOKEN] Verification FAILED: %s: %s", type(e).__name__, e)
         raise
 
 
 def upsert_user_profile(uid: str, email: str, display_name: str | None) -> dict:
     normalized_email = validate_email(email)
+    return _upsert_user_profile(uid, normalized_email)
+
+
+def _upsert_user_profile(uid: str, normalized_email: str) -> dict:
     doc_ref = _user_doc_ref(uid)
     existing = doc_ref.get()
     if not existing.exists:
@@ -93,6 +166,7 @@ def upsert_user_profile(uid: str, email: str, display_name: str | None) -> dict:
             "email": normalized_email,
             "createdAt": firestore.SERVER_TIMESTAMP,
             "monitoredEmails": [],
+            "monitoredEmailsCount": 0,
         }
         doc_ref.set(payload)
         return {
@@ -102,10 +176,14 @@ def upsert_user_profile(uid: str, email: str, display_name: str | None) -> dict:
         }
 
     current = existing.to_dict() or {}
+    monitored_emails = current.get("monitoredEmails", [])
+    if "monitoredEmailsCount" not in current:
+        # Backfill profiles created before the scan filtered on this field
+        doc_ref.update({"monitoredEmailsCount": len(monitored_emails)})
     return {
         "uid": uid,
         "email": current.get("email", normalized_email),
-        "monitoredEmails": current.get("monitoredEmails", []),
+        "monitoredEmails": monitored_emails,
     }
 
 
@@ -122,14 +200,16 @@ def get_user_profile(uid: str) -> dict | None:
 
 
 def list_monitored_emails(uid: str) -> list[dict]:
-    profile = get_user_profile(uid) or {}
-    return list(profile.get("monitoredEmails", []))
+    # Project just the list so the alerts array never crosses the wire here.
+    snapshot = _user_doc_ref(uid).get(field_paths=["monitoredEmails"])
+    if not snapshot.exists:
+        return []
+    return (snapshot.to_dict() or {}).get("monitoredEmails", [])
 
 
-def add_monitored_email(uid: str, email: str) -> dict:
-    normalized_email = validate_email(email)
-    doc_ref = _user_doc_ref(uid)
-    snapshot = doc_ref.get()
+@firestore.transactional
+def _txn_add_monitored_email(transaction, doc_ref, normalized_email: str) -> list[str]:
+    snapshot = doc_ref.get(transaction=transaction)
     if not snapshot.exists:
         raise RuntimeError("User profile not found")
 
@@ -139,14 +219,20 @@ def add_monitored_email(uid: str, email: str) -> dict:
         raise ValueError("Email already monitored")
 
     updated = current + [normalized_email]
-    doc_ref.update({"monitoredEmails": updated})
+    transaction.update(doc_ref, {"monitoredEmails": updated, "monitoredEmailsCount": len(updated)})
     return updated
 
 
-def remove_monitored_email(uid: str, email: str) -> None:
+def add_monitored_email(uid: str, email: str) -> list[str]:
     normalized_email = validate_email(email)
     doc_ref = _user_doc_ref(uid)
-    snapshot = doc_ref.get()
+    updated = _txn_add_monitored_email(_firestore_client().transaction(), doc_ref, normalized_email)
+    return updated
+
+
+@firestore.transactional
+def _txn_remove_monitored_email(transaction, doc_ref, normalized_email: str) -> list[str]:
+    snapshot = doc_ref.get(transaction=transaction)
     if not snapshot.exists:
         raise RuntimeError("User profile not found")
 
@@ -161,31 +247,134 @@ def remove_monitored_email(uid: str, email: str) -> None:
     alerts = list(payload.get("alerts", []))
     updated_alerts = [alert for alert in alerts if alert.get("email") != normalized_email]
     
-    doc_ref.update({
+    transaction.update(doc_ref, {
         "monitoredEmails": updated,
+        "monitoredEmailsCount": len(updated),
         "alerts": updated_alerts
     })
     return updated
 
 
+def remove_monitored_email(uid: str, email: str) -> list[str]:
+    normalized_email = validate_email(email)
+    doc_ref = _user_doc_ref(uid)
+    updated = _txn_remove_monitored_email(_firestore_client().transaction(), doc_ref, normalized_email)
+    return updated
+
+
 # ============ Alert Functions ============
 
-def get_all_users() -> list[dict]:
-    """Get all users from Firestore for scheduled scanning."""
+_SCAN_PAGE_SIZE = 500
+
+
+# Set once every user doc in this process's view carries monitoredEmailsCount.
+_COUNT_BACKFILL_DONE = threading.Event()
+_COUNT_BACKFILL_LOCK = threading.Lock()
+
+
+@firestore.transactional
+def _txn_backfill_count(transaction, doc_ref) -> bool:
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    payload = snapshot.to_dict() or {}
+    if "monitoredEmailsCount" in payload:
+        return False
+    transaction.update(doc_ref, {"monitoredEmailsCount": len(payload.get("monitoredEmails", []))})
+    return True
+
+
+def backfill_monitored_emails_count() -> int:
+    """
+    One-off migration: set monitoredEmailsCount on user docs created before
+    the scan query filtered on it. Safe to re-run; docs that already carry
+    the field are skipped, and each write is a transaction so it cannot race
+    an add or remove.
+    
+    Returns:
+        Number of docs backfilled
+    """
     db = _firestore_client()
-    users = []
+    backfilled = 0
+    for doc in _users_collection().select(["monitoredEmailsCount"]).stream():
+        if "monitoredEmailsCount" in (doc.to_dict() or {}):
+            continue
+        if _txn_backfill_count(db.transaction(), doc.reference):
+            backfilled += 1
+    if backfilled:
+        logger.info("[SCAN] Backfilled monitoredEmailsCount on %s user docs", backfilled)
+    return backfilled
+
+
+def _ensure_monitored_emails_count() -> None:
+    # Docs missing the field would be invisible to the scan query, so the
+    # first scan in a process migrates them before querying.
+    if _COUNT_BACKFILL_DONE.is_set():
+        return
+    with _COUNT_BACKFILL_LOCK:
+        if not _COUNT_BACKFILL_DONE.is_set():
+            backfill_monitored_emails_count()
+            _COUNT_BACKFILL_DONE.set()
+
+
+def _monitoring_users_query(fields: list[str]):
+    # Only users with something to scan, and only the fields the scan reads.
+    # monitoredEmailsCount is projected too: start_after() builds its cursor from it.
+    return (
+        _users_collection()
+        .where(filter=FieldFilter("monitoredEmailsCount", ">", 0))
+        .order_by("monitoredEmailsCount")
+        .order_by("__name__")
+        .select(fields + ["monitoredEmailsCount"])
+    )
+
+
+def _to_scan_user(doc, include_alerts: bool) -> dict:
+    data = doc.to_dict() or {}
+    user = {
+        "uid": doc.id,
+        "email": data.get("email", ""),
+        "monitoredEmails": data.get("monitoredEmails", []),
+    }
+    if include_alerts:
+        user["alerts"] = list(data.get("alerts", []))
+        # bulk_scan_flush writes the alerts back only if the doc is unchanged since this read
+        user["update_time"] = doc.update_time
+    return user
+
+
+def iter_user_pages(page_size: int = _SCAN_PAGE_SIZE, include_alerts: bool = False) -> Iterator[list[dict]]:
+    """
+    Yield users with monitored emails one page at a time, so a scan holds at
+    most one page of profiles in memory.
+    """
+    _ensure_monitored_emails_count()
+    fields = ["email", "monitoredEmails"] + (["alerts"] if include_alerts else [])
+    query = _monitoring_users_query(fields).limit(page_size)
+    last_doc = None
+    while True:
+        page_query = query.start_after(last_doc) if last_doc is not None else query
+        docs = list(page_query.stream())
+        if not docs:
+            return
+        yield [_to_scan_user(doc, include_alerts) for doc in docs]
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+
+def iter_all_users(page_size: int = _SCAN_PAGE_SIZE, include_alerts: bool = False) -> Iterator[dict]:
+    """Iterate users with monitored emails, fetched in pages."""
+    for page in iter_user_pages(page_size, include_alerts):
+        yield from page
+
+
+def get_all_users() -> list[dict]:
+    """Get all users with monitored emails from Firestore for scheduled scanning."""
     try:
-        docs = db.collection("users").stream()
-        for doc in docs:
-            data = doc.to_dict() or {}
-            users.append({
-                "uid": doc.id,
-                "email": data.get("email", ""),
-                "monitoredEmails": data.get("monitoredEmails", []),
-            })
+        return list(iter_all_users())
     except Exception:
-        pass
-    return users
+        return []
 
 
 def get_user_alerts(uid: str) -> list[dict]:
@@ -198,32 +387,64 @@ def get_user_alerts(uid: str) -> list[dict]:
     return list(payload.get("alerts", []))
 
 
-def alert_exists(uid: str, monitored_email: str, breach_name: str) -> bool:
-    """Check if an alert already exists for this breach."""
-    alerts = get_user_alerts(uid)
+def _breach_name(breach) -> str:
+    # Handle both string and dict formats
+    return breach if isinstance(breach, str) else breach.get("name", "")
+
+
+def _alert_has_breach(alerts: list[dict], monitored_email: str, breach_name: str) -> bool:
     for alert in alerts:
         if alert.get("email") == monitored_email:
-            existing_breaches = alert.get("breaches", [])
-            for breach in existing_breaches:
-                # Handle both string and dict formats
-                name = breach if isinstance(breach, str) else breach.get("name", "")
-                if name == breach_name:
+            for breach in alert.get("breaches", []):
+                if _breach_name(breach) == breach_name:
                     return True
+            if breach_name in alert.get("evictedBreachNames", []):
+                return True
     return False
 
 
-def add_alert(uid: str, monitored_email: str, breach_result: dict) -> dict:
+def alerts_version(alerts: list[dict]) -> str:
+    """Digest of the alerts' content, so any added, merged or removed breach changes it."""
+    body = json.dumps(alerts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(body.encode(), digest_size=16).hexdigest()
+
+
+def alert_exists(uid: str, monitored_email: str, breach_name: str) -> bool:
+    """Check if an alert already exists for this breach."""
+    return _alert_has_breach(get_user_alerts(uid), monitored_email, breach_name)
+
+
+# Keeps one alert well under Firestore's 1 MiB document limit; oldest entries drop first.
+_MAX_ALERT_BREACHES = 200
+# Names of breaches dropped by that cap, so later scans still treat them as known.
+_MAX_EVICTED_BREACH_NAMES = 2000
+
+
+def _cap_alert_breaches(breaches: list, evicted_names: list[str]) -> tuple[list, list[str]]:
+    """Keep the newest _MAX_ALERT_BREACHES breaches and remember the names of the rest."""
+    if len(breaches) <= _MAX_ALERT_BREACHES:
+        return breaches, evicted_names
+    evicted = list(evicted_names)
+    known = set(evicted)
+    for breach in breaches[:-_MAX_ALERT_BREACHES]:
+        breach_name = _breach_name(breach)
+        if breach_name and breach_name not in known:
+            known.add(breach_name)
+            evicted.append(breach_name)
+    return breaches[-_MAX_ALERT_BREACHES:], evicted[-_MAX_EVICTED_BREACH_NAMES:]
+
+
+def _merge_alert(alerts: list[dict], monitored_email: str, breach_result: dict,
+                 detected_at: str | None = None) -> dict | None:
     """
-    Add a new breach alert for a user.
-    Only adds breaches that don't already have alerts.
+    Merge a breach result into an alerts list in place.
     
     Args:
-        uid: User's Firebase UID
-        monitored_email: The email that was breached
-        breach_result: Result from hibp_service.check_email()
+        detected_at: ISO timestamp to stamp on the alert; a scan passes one
+            value for all its alerts. Defaults to now.
     
     Returns:
-        The alert object that was added, or None if no new breaches
+        The added or updated alert object, or None if no new breaches
     """
     if not breach_result.get("breached"):
         return None
@@ -232,35 +453,40 @@ def add_alert(uid: str, monitored_email: str, breach_result: dict) -> dict:
     if not breaches:
         return None
     
-    # Filter out breaches that already have alerts
-    # Handle both string and dict formats for breach names
+    # Filter out breaches that already have alerts, against one set of known names
+    # (including those the cap dropped from the stored list)
+    existing_names = set()
+    for alert in alerts:
+        if alert.get("email") == monitored_email:
+            existing_names.update(_breach_name(breach) for breach in alert.get("breaches", []))
+            existing_names.update(alert.get("evictedBreachNames", []))
     new_breaches = []
     for breach in breaches:
-        breach_name = breach if isinstance(breach, str) else breach.get("name", "")
-        if breach_name and not alert_exists(uid, monitored_email, breach_name):
-            new_breaches.append(breach_name if isinstance(breach, str) else breach)
+        breach_name = _breach_name(breach)
+        if breach_name and breach_name not in existing_names:
+            existing_names.add(breach_name)
+            new_breaches.append(breach)
     
     if not new_breaches:
         return None
     
-    doc_ref = _user_doc_ref(uid)
-    snapshot = doc_ref.get()
-    if not snapshot.exists:
-        return None
+    # Firestore rejects SERVER_TIMESTAMP inside array elements, so the
+    # timestamp is computed client-side, once per merge at most.
+    if detected_at is None:
+        detected_at = _utc_now()
     
     # Create alert object including riskScore
+    capped_breaches, evicted_names = _cap_alert_breaches(new_breaches, [])
     alert = {
         "email": monitored_email,
-        "breachCount": len(new_breaches),
-        "breaches": new_breaches,
+        "breachCount": len(capped_breaches),
+        "breaches": capped_breaches,
         "severity": breach_result.get("severity", "Unknown"),
         "riskScore": breach_result.get("riskScore", 0),
-        "detectedAt": _utc_now(),
+        "detectedAt": detected_at,
     }
-    
-    # Get existing alerts and append
-    payload = snapshot.to_dict() or {}
-    alerts = list(payload.get("alerts", []))
+    if evicted_names:
+        alert["evictedBreachNames"] = evicted_names
     
     # Check if there's an existing alert for this email and merge
     existing_alert_idx = None
@@ -273,7 +499,17 @@ def add_alert(uid: str, monitored_email: str, breach_result: dict) -> dict:
         # Merge new breaches into existing alert
         existing = alerts[existing_alert_idx]
         existing_breaches = existing.get("breaches", [])
-        merged_breaches = existing_breaches + new_breaches
+        # Union on breach name, so repeated scans cannot grow the array with duplicates
+        seen = set()
+        merged_breaches = []
+        for breach in existing_breaches + new_breaches:
+            breach_name = _breach_name(breach)
+            if breach_name not in seen:
+                seen.add(breach_name)
+                merged_breaches.append(breach)
+        merged_breaches, evicted_names = _cap_alert_breaches(
+            merged_breaches, existing.get("evictedBreachNames", [])
+        )
         # Recalculate riskScore for merged breaches
         merged_risk_score = min(len(merged_breaches) * 25, 100)
         alerts[existing_alert_idx] = {
@@ -282,11 +518,113 @@ def add_alert(uid: str, monitored_email: str, breach_result: dict) -> dict:
             "breaches": merged_breaches,
             "severity": breach_result.get("severity", existing.get("severity", "Unknown")),
             "riskScore": merged_risk_score,
-            "detectedAt": _utc_now(),
+            "detectedAt": detected_at,
         }
+        if evicted_names:
+            alerts[existing_alert_idx]["evictedBreachNames"] = evicted_names
         alert = alerts[existing_alert_idx]
     else:
         alerts.append(alert)
     
-    doc_ref.update({"alerts": alerts})
     return alert
+
+
+@firestore.transactional
+def _txn_add_alert(transaction, doc_ref, monitored_email: str, breach_result: dict,
+                   detected_at: str | None = None) -> dict | None:
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    
+    # Get existing alerts and merge
+    payload = snapshot.to_dict() or {}
+    if monitored_email not in payload.get("monitoredEmails", []):
+        # Removed since the breach check started; never alert on an unmonitored address
+        return None
+    alerts = list(payload.get("alerts", []))
+    alert = _merge_alert(alerts, monitored_email, breach_result, detected_at)
+    if alert is None:
+        return None
+    
+    transaction.update(doc_ref, {"alerts": alerts})
+    return alert
+
+
+def add_alert(uid: str, monitored_email: str, breach_result: dict) -> dict:
+    """
+    Add a new breach alert for a user.
+    Only adds breaches that don't already have alerts.
+    
+    The read and the write run in one Firestore transaction, so concurrent
+    writers retry instead of overwriting each other's alerts.
+    
+    Args:
+        uid: User's Firebase UID
+        monitored_email: The email that was breached
+        breach_result: Result from hibp_service.check_email()
+    
+    Returns:
+        The alert object that was added, or None if no new breaches
+    """
+    if not breach_result.get("breached") or not breach_result.get("breaches"):
+        return None
+    
+    doc_ref = _user_doc_ref(uid)
+    return _txn_add_alert(_firestore_client().transaction(), doc_ref, monitored_email, breach_result)
+
+
+_BATCH_FLUSH_OPS = 450  # Firestore caps a WriteBatch at 500 writes
+
+
+def _replay_scan_merges(uid: str, merges: list[tuple[str, dict]], detected_at: str | None) -> bool:
+    """Re-apply one user's scan merges against the current doc, transactionally."""
+    db = _firestore_client()
+    doc_ref = _users_collection().document(uid)
+    changed = False
+    for monitored_email, breach_result in merges:
+        if _txn_add_alert(db.transaction(), doc_ref, monitored_email, breach_result, detected_at):
+            changed = True
+    return changed
+
+
+def bulk_scan_flush(updates: dict[str, dict], detected_at: str | None = None) -> set[str]:
+    """
+    Write the alerts merged by a scheduled scan in batched commits.
+    
+    Each write is conditional on the doc's update_time from the scan's read,
+    so a stale alerts array never overwrites a concurrent add or remove. When
+    a batch hits such a conflict, its users are replayed one by one through
+    the transactional merge instead.
+    
+    Args:
+        updates: Mapping of uid -> {"alerts": merged list, "update_time": the
+            snapshot's update_time, "merges": [(monitored_email, breach_result)]}
+        detected_at: Timestamp the scan stamped on its alerts
+    
+    Returns:
+        UIDs whose alerts were written
+    """
+    if not updates:
+        return set()
+    
+    db = _firestore_client()
+    users = _users_collection()
+    items = list(updates.items())
+    written = set()
+    for start in range(0, len(items), _BATCH_FLUSH_OPS):
+        chunk = items[start:start + _BATCH_FLUSH_OPS]
+        batch = db.batch()
+        for uid, update in chunk:
+            option = db.write_option(last_update_time=update["update_time"])
+            batch.update(users.document(uid), {"alerts": update["alerts"]}, option=option)
+        try:
+            batch.commit()
+            written.update(uid for uid, _ in chunk)
+            continue
+        except (FailedPrecondition, NotFound):
+            # A batch is all-or-nothing; rare, so replaying the whole chunk is fine
+            logger.info("[SCAN] Alerts changed during scan; replaying %s users transactionally", len(chunk))
+        for uid, update in chunk:
+            if _replay_scan_merges(uid, update["merges"], detected_at):
+                written.add(uid)
+    return written
@@ -4,26 +4,147 @@ Uses paid HIBP API key for real-time breach data.
 """
 import logging
 import os
+import threading
 import time
+from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
-# Rate limit tracking
+# One pooled keep-alive session for all HIBP lookups in the process: the scan
+# workers here and the /check-email path in breach_check_service.
+# Both callers take a slot from _rate_limit_wait() before each GET: check_email
+# below, and breach_check_service._fetch_hibp via wait_for_request_slot(). Only
+# failed connects are retried (those requests never reached HIBP); any 429/5xx
+# goes back to the caller, so every request HIBP sees has had its own slot.
+_session = requests.Session()
+_session.headers.update({"user-agent": "DarkWebMonitorHackathon"})
+_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            connect=3,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset({"GET"}),
+        ),
+    ),
+)
+
+
+def http_session() -> requests.Session:
+    """Return the shared HIBP session."""
+    return _session
+
+
+# Rate limit tracking. The lock only guards slot reservation, so concurrent scan
+# workers queue for HIBP without holding it while they sleep.
+_rate_lock = threading.Lock()
 _last_request_time: float = 0
-_MIN_REQUEST_INTERVAL = 1.5  # HIBP requires 1.5s between requests
+_MIN_REQUEST_INTERVAL = 1.5  # HIBP requires 1.5s between requests on the base tier
+
+
+def _min_request_interval() -> float:
+    """Seconds between HIBP requests; higher subscription tiers can lower it via env."""
+    try:
+        return max(float(os.getenv("HIBP_MIN_REQUEST_INTERVAL", str(_MIN_REQUEST_INTERVAL))), 0.0)
+    except ValueError:
+        return _MIN_REQUEST_INTERVAL
 
 
 def _rate_limit_wait():
-    """Enforce rate limiting between HIBP API requests."""
+    """Enforce rate limiting between HIBP API requests, across all threads."""
     global _last_request_time
-    now = time.time()
-    elapsed = now - _last_request_time
-    if elapsed < _MIN_REQUEST_INTERVAL:
-        sleep_time = _MIN_REQUEST_INTERVAL - elapsed
+    interval = _min_request_interval()
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _last_request_time + interval)
+        _last_request_time = slot
+    sleep_time = slot - now
+    if sleep_time > 0:
         time.sleep(sleep_time)
-    _last_request_time = time.time()
+
+
+def wait_for_request_slot() -> None:
+    """Block until the next HIBP request may be sent; the spacing is shared by every caller in the process."""
+    _rate_limit_wait()
+
+
+try:
+    # Optional: persists cached results across restarts; otherwise they live in memory.
+    import diskcache
+except ImportError:
+    diskcache = None
+
+_cache_lock = threading.Lock()
+_disk_cache = None
+_memory_cache: dict[str, tuple[float, dict]] = {}
+# Bounds the in-memory fallback; expired entries are swept before evicting live ones.
+_MEMORY_CACHE_MAX = 10_000
+
+
+def _cache_ttl_seconds() -> float:
+    try:
+        return float(os.getenv("HIBP_CACHE_TTL_SECONDS", "43200"))
+    except ValueError:
+        return 43200.0
+
+
+def _get_disk_cache():
+    global _disk_cache
+    if _disk_cache is None:
+        with _cache_lock:
+            if _disk_cache is None:
+                configured = os.getenv("HIBP_CACHE_DIR", "data/hibp_cache")
+                path = Path(configured)
+                if not path.is_absolute():
+                    path = Path(__file__).resolve().parents[1] / configured
+                _disk_cache = diskcache.Cache(str(path))
+    return _disk_cache
+
+
+def _cache_get(email: str) -> dict | None:
+    if _cache_ttl_seconds() <= 0:
+        return None
+    if diskcache is not None:
+        hit = _get_disk_cache().get(email)
+    else:
+        hit = None
+        with _cache_lock:
+            entry = _memory_cache.get(email)
+            if entry is not None:
+                expires_at, hit = entry
+                if expires_at <= time.monotonic():
+                    del _memory_cache[email]
+                    hit = None
+    # Callers annotate the result dict, so never hand out the cached object itself.
+    return dict(hit) if hit is not None else None
+
+
+def _cache_set(email: str, result: dict) -> None:
+    ttl = _cache_ttl_seconds()
+    if ttl <= 0:
+        return
+    if diskcache is not None:
+        _get_disk_cache().set(email, dict(result), expire=ttl)
+    else:
+        now = time.monotonic()
+        with _cache_lock:
+            if len(_memory_cache) >= _MEMORY_CACHE_MAX and email not in _memory_cache:
+                for key in [k for k, (expires_at, _) in _memory_cache.items() if expires_at <= now]:
+                    del _memory_cache[key]
+                if len(_memory_cache) >= _MEMORY_CACHE_MAX:
+                    # Still full: drop the oldest insertion
+                    del _memory_cache[next(iter(_memory_cache))]
+            _memory_cache[email] = (now + ttl, dict(result))
 
 
 def _calculate_severity(breach_count: int) -> str:
@@ -46,14 +167,20 @@ def _calculate_risk_score(breach_count: int) -> int:
     return min(breach_count * 25, 100)
 
 
+# Financial and credential data classes (lowercased) that make a breach high severity
+_HIGH_TOKENS = frozenset({
+    "financial info", "credit cards", "bank account", "social security number",
+    "password", "passwords", "hashes",
+})
+_EMAIL_ONLY = frozenset({"email addresses"})
+
+
 def _severity_from_data_classes(data_exposed: list[str]) -> str:
     """Determine severity based on data types involved."""
     values = {item.lower() for item in data_exposed}
-    if any(k in values for k in ["financial info", "credit cards", "bank account", "social security number"]):
-        return "High"
-    if any(k in values for k in ["password", "passwords", "hashes"]):
+    if not _HIGH_TOKENS.isdisjoint(values):
         return "High"
-    if "email addresses" in values and len(values) == 1:
+    if values == _EMAIL_ONLY:
         return "Low"
     return "Medium"
 
@@ -87,6 +214,11 @@ def check_email(email: str) -> dict:
             "error": "Invalid email",
         }
     
+    # Recent successful lookups are served from cache; errors are never cached.
+    cached = _cache_get(email)
+    if cached is not None:
+        return cached
+    
     api_key = os.getenv("HIBP_API_KEY", "").strip()
     if not api_key:
         logger.error("HIBP_API_KEY not configured")
@@ -106,19 +238,16 @@ def check_email(email: str) -> dict:
     url = f"https://haveibeenpwned.com/api/v3/breachedaccount/{email}"
     
     try:
-        response = requests.get(
+        response = _session.get(
             url,
-            headers={
-                "hibp-api-key": api_key,
-                "user-agent": "DarkWebMonitorHackathon",
-            },
+            headers={"hibp-api-key": api_key},
             timeout=10,
         )
         
         # 404 = Not found / No breaches
         if response.status_code == 404:
-            logger.info(f"HIBP: {email} - No breaches found")
-            return {
+            logger.info("HIBP: %s - No breaches found", email)
+            result = {
                 "email": email,
                 "breached": False,
                 "breachCount": 0,
@@ -127,11 +256,13 @@ def check_email(email: str) -> dict:
                 "riskScore": 0,
                 "error": None,
             }
+            _cache_set(email, result)
+            return result
         
         # 429 = Rate limited
         if response.status_code == 429:
             retry_after = response.headers.get("Retry-After", "2")
-            logger.warning(f"HIBP: Rate limited for {email}, retry after {retry_after}s")
+            logger.warning("HIBP: Rate limited for %s, retry after %ss", email, retry_after)
             return {
                 "email": email,
                 "breached": False,
@@ -174,9 +305,9 @@ def check_email(email: str) -> dict:
         severity = _calculate_severity(breach_count)
         risk_score = _calculate_risk_score(breach_count)
         
-        logger.info(f"HIBP: {email} - {breach_count} breaches found, severity={severity}, riskScore={risk_score}")
+        logger.info("HIBP: %s - %s breaches found, severity=%s, riskScore=%s", email, breach_count, severity, risk_score)
         
-        return {
+        result = {
             "email": email,
             "breached": breach_count > 0,
             "breachCount": breach_count,
@@ -185,9 +316,11 @@ def check_email(email: str) -> dict:
             "riskScore": risk_score,
             "error": None,
         }
+        _cache_set(email, result)
+        return result
         
     except requests.exceptions.Timeout:
-        logger.error(f"HIBP: Timeout for {email}")
+        logger.error("HIBP: Timeout for %s", email)
         return {
             "email": email,
             "breached": False,
@@ -198,7 +331,7 @@ def check_email(email: str) -> dict:
             "error": "Request timeout",
         }
     except requests.exceptions.RequestException as e:
-        logger.error(f"HIBP: Network error for {email}: {e}")
+        logger.error("HIBP: Network error for %s: %s", email, e)
         return {
             "email": email,
             "breached": False,
@@ -209,7 +342,7 @@ def check_email(email: str) -> dict:
             "error": f"Network error: {str(e)}",
         }
     except Exception as e:
-        logger.error(f"HIBP: Unexpected error for {email}: {e}")
+        logger.error("HIBP: Unexpected error for %s: %s", email, e)
         return {
             "email": email,
             "breached": False,
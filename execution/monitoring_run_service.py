@@ -1,20 +1,48 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from requests import HTTPError
+
 from execution.breach_check_service import run_breach_check
 from execution.event_log_and_alert_service import get_monitored_emails, process_check_result
 from execution.risk_response_service import evaluate_risk_and_recommendations
 
 
+logger = logging.getLogger(__name__)
+
+
+def _monitor_workers() -> int:
+    try:
+        return max(int(os.getenv("MONITOR_WORKERS", "8")), 1)
+    except ValueError:
+        return 8
+
+
+def _check_one_email(email: str) -> dict | None:
+    try:
+        check_payload = run_breach_check(email)
+    except HTTPError as exc:
+        # HIBP rate limit or outage: skip this email until the next cycle
+        logger.warning("[MONITOR] Skipping %s: %s", email, exc)
+        return None
+    enriched = evaluate_risk_and_recommendations(check_payload)
+    return process_check_result(enriched)
+
+
 def run_monitoring_cycle() -> dict:
     emails = get_monitored_emails()
     processed = 0
     alerts = 0
 
-    for email in emails:
-        check_payload = run_breach_check(email)
-        enriched = evaluate_risk_and_recommendations(check_payload)
-        outcome = process_check_result(enriched)
-        processed += 1
-        if outcome.get("alert_triggered"):
-            alerts += 1
+    # Each check is dominated by network and SQLite I/O, so threads overlap the waits.
+    with ThreadPoolExecutor(max_workers=_monitor_workers()) as executor:
+        for outcome in executor.map(_check_one_email, emails):
+            if outcome is None:
+                continue
+            processed += 1
+            if outcome.get("alert_triggered"):
+                alerts += 1
 
     return {
         "processed_emails": processed,
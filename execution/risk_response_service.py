@@ -1,34 +1,49 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 
 
 LOW_MAX = 30
 MEDIUM_MAX = 70
 
 
+# Substring tokens checked in order; "email" alone is an exact match (see below).
+_WEIGHT_TOKENS = (("financial", 35), ("credit", 35), ("bank", 35), ("password", 25))
+_EXACT_WEIGHTS = {"email": 5}
+_DEFAULT_WEIGHT = 10
+# (max age in years, weight), checked in order
+_RECENCY_BUCKETS = ((1, 20), (3, 10), (5, 5))
+
+
+@lru_cache(maxsize=512)
+def _normalized_weight(value: str) -> int:
+    for token, weight in _WEIGHT_TOKENS:
+        if token in value:
+            return weight
+    return _EXACT_WEIGHTS.get(value, _DEFAULT_WEIGHT)
+
+
 def _data_type_weight(data_type: str) -> int:
-    value = data_type.lower()
-    if "financial" in value or "credit" in value or "bank" in value:
-        return 35
-    if "password" in value:
-        return 25
-    if value == "email":
-        return 5
-    return 10
+    return _normalized_weight(data_type.lower())
 
 
-def _recency_weight(breach_date: str) -> int:
+@lru_cache(maxsize=1024)
+def _breach_year(breach_date: str) -> int | None:
     try:
-        breach_year = datetime.fromisoformat(breach_date).year
+        return datetime.fromisoformat(breach_date).year
     except Exception:
+        return None
+
+
+def _recency_weight(breach_date: str, current_year: int | None = None) -> int:
+    breach_year = _breach_year(breach_date)
+    if breach_year is None:
         return 0
-    current_year = datetime.utcnow().year
+    if current_year is None:
+        current_year = datetime.now(timezone.utc).year
     age = max(current_year - breach_year, 0)
-    if age <= 1:
-        return 20
-    if age <= 3:
-        return 10
-    if age <= 5:
-        return 5
+    for max_age, weight in _RECENCY_BUCKETS:
+        if age <= max_age:
+            return weight
     return 0
 
 
@@ -40,23 +55,31 @@ def _risk_category(score: int) -> str:
     return "High"
 
 
-def _recommendations_from_data_types(data_types: set[str]) -> list[str]:
-    recommendations = []
-    if "password" in data_types or "passwords" in data_types:
-        recommendations.append("Reset password immediately and enable 2FA.")
-    if "financial info" in data_types or any("financial" in item for item in data_types):
-        recommendations.append("Monitor bank statements and card activity.")
-    if data_types == {"email"}:
-        recommendations.append("Beware of phishing attempts and suspicious emails.")
-    if "username" in data_types and (
-        "password" in data_types or "passwords" in data_types
-    ):
-        recommendations.append("Change passwords across platforms and avoid reuse.")
+_PASSWORD_TYPES = frozenset({"password", "passwords"})
+
+# (predicate over the lowercased data-type set, message), evaluated in order
+_RECOMMENDATION_RULES = (
+    (lambda types: not types.isdisjoint(_PASSWORD_TYPES),
+     "Reset password immediately and enable 2FA."),
+    # Substring match also covers the exact "financial info" type
+    (lambda types: any("financial" in item for item in types),
+     "Monitor bank statements and card activity."),
+    (lambda types: types == {"email"},
+     "Beware of phishing attempts and suspicious emails."),
+    (lambda types: "username" in types and not types.isdisjoint(_PASSWORD_TYPES),
+     "Change passwords across platforms and avoid reuse."),
+)
+_DEFAULT_RECOMMENDATION = "Review account security settings and enable 2FA where possible."
+
 
-    if not recommendations:
-        recommendations.append("Review account security settings and enable 2FA where possible.")
+@lru_cache(maxsize=256)
+def _recommendations_for(data_types: frozenset[str]) -> tuple[str, ...]:
+    recommendations = tuple(message for matches, message in _RECOMMENDATION_RULES if matches(data_types))
+    return recommendations or (_DEFAULT_RECOMMENDATION,)
 
-    return recommendations
+
+def _recommendations_from_data_types(data_types: set[str]) -> list[str]:
+    return list(_recommendations_for(frozenset(data_types)))
 
 
 def evaluate_risk_and_recommendations(check_payload: dict) -> dict:
@@ -65,14 +88,15 @@ def evaluate_risk_and_recommendations(check_payload: dict) -> dict:
 
     score = min(breach_count * 10, 30)
     all_data_types: set[str] = set()
+    current_year = datetime.now(timezone.utc).year
 
     for breach in breaches:
         data_exposed = breach.get("data_exposed", [])
         for item in data_exposed:
             normalized = item.lower()
             all_data_types.add(normalized)
-            score += _data_type_weight(item)
-        score += _recency_weight(breach.get("breach_date", ""))
+            score += _normalized_weight(normalized)
+        score += _recency_weight(breach.get("breach_date", ""), current_year)
 
     score = min(score, 100)
     category = _risk_category(score)
@@ -5,8 +5,14 @@ Runs periodic scans across all monitored emails for all users.
 import logging
 import os
 import threading
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; only single-process runs schedule there
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
@@ -23,20 +29,153 @@ def get_scan_interval_hours() -> float:
         return 3.0
 
 
+def get_scan_workers() -> int:
+    """Get the number of concurrent scan workers from environment, default 16."""
+    try:
+        return max(int(os.getenv("SCAN_WORKERS", "16")), 1)
+    except ValueError:
+        return 16
+
+
+def _scan_monitored_email(monitored_email: str, targets: list[tuple[dict, threading.Lock]],
+                          scan: dict, scan_lock: threading.Lock) -> None:
+    """
+    Check one monitored email once and merge any new alert into the in-memory
+    alerts of every user monitoring it.
+    """
+    from execution.firebase_identity_service import _merge_alert
+    from execution.hibp_service import check_email
+
+    stats = scan["stats"]
+
+    def bump(key: str, amount: int = 1):
+        with scan_lock:
+            stats[key] += amount
+
+    bump("emails_checked", len(targets))
+    try:
+        # Check for breaches
+        result = check_email(monitored_email)
+    except Exception as e:
+        logger.error("[SCAN] Error processing %s: %s", monitored_email, e)
+        bump("errors", len(targets))
+        return
+    
+    if result.get("error"):
+        logger.warning("[SCAN] Error checking %s: %s", monitored_email, result['error'])
+        bump("errors", len(targets))
+        return
+    
+    if not result.get("breached"):
+        return
+    
+    for user, user_lock in targets:
+        try:
+            bump("breaches_found", result.get("breachCount", 0))
+            
+            # Add alert if new breaches found; emails of the same user share one alerts list.
+            with user_lock:
+                alert = _merge_alert(user["alerts"], monitored_email, result, scan["detected_at"])
+            
+            if alert:
+                logger.info("[SCAN] New alert created for %s: %s breaches, severity=%s, riskScore=%s", monitored_email, alert.get('breachCount'), alert.get('severity'), alert.get('riskScore'))
+                with scan_lock:
+                    stats["alerts_created"] += 1
+                    scan["merges"].setdefault(user["uid"], []).append((monitored_email, result))
+                    if user.get("email"):
+                        scan["notifications"].append(
+                            (user["uid"], user["email"], monitored_email, list(alert.get("breaches", [])))
+                        )
+            
+        except Exception as e:
+            logger.error("[SCAN] Error processing %s: %s", monitored_email, e)
+            bump("errors")
+
+
+def _send_scan_notification(user_email: str, monitored_email: str, breaches: list) -> bool:
+    from execution.email_service import send_alert_email
+
+    try:
+        return bool(send_alert_email(user_email, monitored_email, breaches))
+    except Exception as e:
+        logger.error("[SCAN] Failed to send email: %s", e)
+        return False
+
+
+def _scan_user_page(users: list[dict], executor: ThreadPoolExecutor, stats: dict) -> None:
+    """Check, store and notify for one page of users."""
+    from execution.firebase_identity_service import bulk_scan_flush
+
+    scan = {
+        "stats": stats,
+        # uid -> [(monitored_email, breach_result)] that produced an alert
+        "merges": {},
+        "notifications": [],
+        # Every alert from one scan carries the scan's start time
+        "detected_at": stats["started_at"],
+    }
+    scan_lock = threading.Lock()
+    users_by_uid = {user["uid"]: user for user in users if user.get("uid")}
+    
+    # Users monitoring the same address share a single HIBP lookup.
+    email_targets: dict[str, list[tuple[dict, threading.Lock]]] = {}
+    for uid, user in users_by_uid.items():
+        monitored_emails = user.get("monitoredEmails", [])
+        if not monitored_emails:
+            continue
+        
+        stats["users_scanned"] += 1
+        logger.info("[SCAN] Scanning user %s... (%s emails)", uid[:8], len(monitored_emails))
+        
+        user_lock = threading.Lock()
+        for monitored_email in monitored_emails:
+            email_targets.setdefault(monitored_email, []).append((user, user_lock))
+    
+    logger.info("[SCAN] %s unique emails to check", len(email_targets))
+    
+    futures = [
+        executor.submit(_scan_monitored_email, monitored_email, targets, scan, scan_lock)
+        for monitored_email, targets in email_targets.items()
+    ]
+    for future in futures:
+        future.result()
+    
+    updates = {
+        uid: {
+            "alerts": users_by_uid[uid]["alerts"],
+            "update_time": users_by_uid[uid]["update_time"],
+            "merges": merges,
+        }
+        for uid, merges in scan["merges"].items()
+    }
+    written = bulk_scan_flush(updates, scan["detected_at"])
+    logger.info("[SCAN] Stored alerts for %s users", len(written))
+    
+    # Only notify for alerts that were actually stored
+    notifications = [args[1:] for args in scan["notifications"] if args[0] in written]
+    sent = executor.map(lambda args: _send_scan_notification(*args), notifications)
+    stats["emails_sent"] += sum(sent)
+
+
 def run_full_scan() -> dict:
     """
     Run a full breach scan across all users and their monitored emails.
     
+    Users are streamed from Firestore in pages. Within a page, monitored emails
+    are checked concurrently on a thread pool (SCAN_WORKERS); hibp_service keeps
+    the HIBP request spacing global across workers. New alerts are merged in
+    memory and written back in batched commits that only apply if the user doc
+    is unchanged since it was read; conflicting users are merged again in a
+    transaction. Notification emails go out once the alerts are stored.
+    
     Returns:
         dict with scan statistics
     """
     # Import here to avoid circular imports
-    from execution.firebase_identity_service import get_all_users, add_alert, get_user_profile
-    from execution.hibp_service import check_email
-    from execution.email_service import send_alert_email
+    from execution.firebase_identity_service import iter_user_pages
     
     start_time = datetime.now(timezone.utc)
-    logger.info(f"[SCAN] Starting full breach scan at {start_time.isoformat()}")
+    logger.info("[SCAN] Starting full breach scan at %s", start_time.isoformat())
     
     stats = {
         "started_at": start_time.isoformat(),
@@ -49,76 +188,31 @@ def run_full_scan() -> dict:
     }
     
     try:
-        users = get_all_users()
-        logger.info(f"[SCAN] Found {len(users)} users to scan")
-        
-        for user in users:
-            uid = user.get("uid")
-            user_email = user.get("email", "")
-            monitored_emails = user.get("monitoredEmails", [])
-            
-            if not uid or not monitored_emails:
-                continue
-            
-            stats["users_scanned"] += 1
-            logger.info(f"[SCAN] Scanning user {uid[:8]}... ({len(monitored_emails)} emails)")
-            
-            for monitored_email in monitored_emails:
-                try:
-                    stats["emails_checked"] += 1
-                    
-                    # Check for breaches
-                    result = check_email(monitored_email)
-                    
-                    if result.get("error"):
-                        logger.warning(f"[SCAN] Error checking {monitored_email}: {result['error']}")
-                        stats["errors"] += 1
-                        continue
-                    
-                    if not result.get("breached"):
-                        continue
-                    
-                    stats["breaches_found"] += result.get("breachCount", 0)
-                    
-                    # Add alert if new breaches found
-                    alert = add_alert(uid, monitored_email, result)
-                    
-                    if alert:
-                        stats["alerts_created"] += 1
-                        logger.info(f"[SCAN] New alert created for {monitored_email}: {alert.get('breachCount')} breaches, severity={alert.get('severity')}, riskScore={alert.get('riskScore')}")
-                        
-                        # Send email notification
-                        if user_email:
-                            try:
-                                sent = send_alert_email(
-                                    user_email,
-                                    monitored_email,
-                                    alert.get("breaches", [])
-                                )
-                                if sent:
-                                    stats["emails_sent"] += 1
-                            except Exception as e:
-                                logger.error(f"[SCAN] Failed to send email: {e}")
-                    
-                except Exception as e:
-                    logger.error(f"[SCAN] Error processing {monitored_email}: {e}")
-                    stats["errors"] += 1
-                    continue
+        with ThreadPoolExecutor(max_workers=get_scan_workers(), thread_name_prefix="BreachScan") as executor:
+            for users in iter_user_pages(include_alerts=True):
+                logger.info("[SCAN] Found %s users to scan", len(users))
+                _scan_user_page(users, executor, stats)
         
         end_time = datetime.now(timezone.utc)
         duration = (end_time - start_time).total_seconds()
         stats["completed_at"] = end_time.isoformat()
         stats["duration_seconds"] = duration
         
-        logger.info(f"[SCAN] Completed in {duration:.1f}s - "
-                   f"{stats['users_scanned']} users, "
-                   f"{stats['emails_checked']} emails, "
-                   f"{stats['breaches_found']} breaches, "
-                   f"{stats['alerts_created']} new alerts, "
-                   f"{stats['emails_sent']} emails sent")
+        logger.info("[SCAN] Completed in %.1fs - "
+                   "%s users, "
+                   "%s emails, "
+                   "%s breaches, "
+                   "%s new alerts, "
+                   "%s emails sent",
+                   duration,
+                   stats['users_scanned'],
+                   stats['emails_checked'],
+                   stats['breaches_found'],
+                   stats['alerts_created'],
+                   stats['emails_sent'])
         
     except Exception as e:
-        logger.error(f"[SCAN] Fatal error during scan: {e}")
+        logger.error("[SCAN] Fatal error during scan: %s", e)
         stats["fatal_error"] = str(e)
     
     return stats
@@ -138,21 +232,33 @@ def check_single_email_with_alert(uid: str, user_email: str, monitored_email: st
         The breach check result with alert status
     """
     from execution.hibp_service import check_email
+    
+    logger.info("[CHECK] Immediate breach check for %s", monitored_email)
+    
+    return record_check_alert(uid, user_email, monitored_email, check_email(monitored_email))
+
+
+def record_check_alert(uid: str, user_email: str, monitored_email: str, result: dict) -> dict:
+    """
+    Create an alert and send the notification for an immediate check result.
+    Callers that run hibp_service.check_email() themselves (e.g. alongside
+    adding the email) call this once the email is actually monitored.
+    
+    Returns:
+        The breach check result with alert status
+    """
     from execution.firebase_identity_service import add_alert
     from execution.email_service import send_alert_email
     
-    logger.info(f"[CHECK] Immediate breach check for {monitored_email}")
-    
-    result = check_email(monitored_email)
     result["alert_created"] = False
     result["email_sent"] = False
     
     if result.get("error"):
-        logger.warning(f"[CHECK] Error checking {monitored_email}: {result['error']}")
+        logger.warning("[CHECK] Error checking %s: %s", monitored_email, result['error'])
         return result
     
     if not result.get("breached"):
-        logger.info(f"[CHECK] No breaches found for {monitored_email}")
+        logger.info("[CHECK] No breaches found for %s", monitored_email)
         return result
     
     # Try to create alert
@@ -160,7 +266,7 @@ def check_single_email_with_alert(uid: str, user_email: str, monitored_email: st
         alert = add_alert(uid, monitored_email, result)
         if alert:
             result["alert_created"] = True
-            logger.info(f"[CHECK] Alert created for {monitored_email}")
+            logger.info("[CHECK] Alert created for %s", monitored_email)
             
             # Send notification email
             if user_email:
@@ -172,62 +278,88 @@ def check_single_email_with_alert(uid: str, user_email: str, monitored_email: st
                     )
                     result["email_sent"] = sent
                 except Exception as e:
-                    logger.error(f"[CHECK] Failed to send email: {e}")
+                    logger.error("[CHECK] Failed to send email: %s", e)
     except Exception as e:
-        logger.error(f"[CHECK] Failed to create alert: {e}")
+        logger.error("[CHECK] Failed to create alert: %s", e)
     
     return result
 
 
 _scheduler_thread: threading.Thread | None = None
-_scheduler_running = False
+_stop_event = threading.Event()
+
+_SCAN_ATTEMPTS = 3
+_RETRY_BASE_SECONDS = 5
+_RETRY_MAX_SECONDS = 120
+
+
+def get_startup_delay_seconds() -> float:
+    """Get the delay before the startup scan from environment, default 30 seconds."""
+    try:
+        return max(float(os.getenv("SCAN_STARTUP_DELAY_SECONDS", "30")), 0.0)
+    except ValueError:
+        return 30.0
+
+
+def _run_scan_with_retry(label: str) -> dict | None:
+    """
+    Run a full scan, retrying with exponential backoff when it fails outright.
+    Backoff waits on the stop event, so stop_scheduler() cancels pending retries.
+    """
+    for attempt in range(1, _SCAN_ATTEMPTS + 1):
+        try:
+            stats = run_full_scan()
+            error = stats.get("fatal_error")
+        except Exception as e:
+            stats, error = None, str(e)
+        if not error:
+            return stats
+        
+        logger.error("[SCHEDULER] %s scan failed (attempt %s/%s): %s", label, attempt, _SCAN_ATTEMPTS, error)
+        if attempt == _SCAN_ATTEMPTS:
+            break
+        delay = min(_RETRY_BASE_SECONDS * 2 ** (attempt - 1), _RETRY_MAX_SECONDS)
+        if _stop_event.wait(delay):
+            break
+    return stats
 
 
 def start_scheduler():
     """Start the background scheduler for periodic breach scans."""
-    global _scheduler_thread, _scheduler_running
+    global _scheduler_thread
     
-    if _scheduler_running:
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
         logger.info("[SCHEDULER] Already running")
         return
     
-    _scheduler_running = True
+    _stop_event.clear()
     
     def scheduler_worker():
-        global _scheduler_running
-        
         interval_hours = get_scan_interval_hours()
         interval_seconds = interval_hours * 3600
         
-        logger.info(f"[SCHEDULER] Started with {interval_hours}h interval")
+        logger.info("[SCHEDULER] Started with %sh interval", interval_hours)
+        
+        # Give the web process a moment to warm up Firestore and HIBP connections
+        if _stop_event.wait(get_startup_delay_seconds()):
+            logger.info("[SCHEDULER] Stopped")
+            return
         
         # Run initial scan on startup
         logger.info("[SCHEDULER] Running startup scan...")
-        try:
-            run_full_scan()
-        except Exception as e:
-            logger.error(f"[SCHEDULER] Startup scan failed: {e}")
+        _run_scan_with_retry("Startup")
         
-        # Then loop forever with interval
-        while _scheduler_running:
-            logger.info(f"[SCHEDULER] Sleeping for {interval_hours} hours...")
+        # Then loop until stop_scheduler() sets the event
+        while not _stop_event.is_set():
+            logger.info("[SCHEDULER] Sleeping for %s hours...", interval_hours)
             
-            # Sleep in chunks so we can stop gracefully
-            sleep_chunks = int(interval_seconds / 30)
-            for _ in range(sleep_chunks):
-                if not _scheduler_running:
-                    break
-                time.sleep(30)
-            
-            if not _scheduler_running:
+            # Wakes immediately when a stop is requested
+            if _stop_event.wait(interval_seconds):
                 break
             
             # Run scheduled scan
             logger.info("[SCHEDULER] Running scheduled scan...")
-            try:
-                run_full_scan()
-            except Exception as e:
-                logger.error(f"[SCHEDULER] Scheduled scan failed: {e}")
+            _run_scan_with_retry("Scheduled")
         
         logger.info("[SCHEDULER] Stopped")
     
@@ -236,8 +368,56 @@ def start_scheduler():
     logger.info("[SCHEDULER] Background thread started")
 
 
+_ELECTION_POLL_SECONDS = 15
+_election_thread: threading.Thread | None = None
+# Open for the life of the process once elected; closing it would release the lock.
+_election_lock_file = None
+
+
+def start_scheduler_when_elected(lock_path: str) -> None:
+    """
+    Start the scheduler in whichever process holds an exclusive flock on lock_path.
+    
+    Every worker of a multi-process server calls this. The others keep polling,
+    so when the holder exits for any reason (crash, reload, scale-down) the OS
+    releases its lock and a surviving worker takes over the schedule.
+    """
+    global _election_thread
+    
+    if fcntl is None:
+        start_scheduler()
+        return
+    if _election_thread is not None and _election_thread.is_alive():
+        return
+    
+    path = Path(lock_path)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    def election_worker():
+        global _election_lock_file
+        
+        lock_file = open(path, "a")
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Held by another worker; stop_scheduler() also ends the wait
+                if _stop_event.wait(_ELECTION_POLL_SECONDS):
+                    lock_file.close()
+                    return
+                continue
+            _election_lock_file = lock_file
+            logger.info("[SCHEDULER] Acquired %s (pid %s)", path.name, os.getpid())
+            start_scheduler()
+            return
+    
+    _election_thread = threading.Thread(target=election_worker, daemon=True, name="SchedulerElection")
+    _election_thread.start()
+
+
 def stop_scheduler():
     """Stop the background scheduler."""
-    global _scheduler_running
-    _scheduler_running = False
+    _stop_event.set()
     logger.info("[SCHEDULER] Stop requested")
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for production: gunicorn -c gunicorn_conf.py run:app
+Handlers spend nearly all their time waiting on HIBP and Firebase, so each
+worker runs many threads (gthread). Set GUNICORN_WORKER_CLASS=gevent when
+gevent is installed; its worker monkey-patches sockets before the app is
+imported, as long as the app is not preloaded.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+# Not preloaded: the Firebase/gRPC clients, HTTP sessions and the logging
+# listener thread are created at import and do not survive a fork.
+preload_app = False
+
+# One worker runs the scan scheduler: every worker competes for an flock on
+# this file and the holder schedules. When it exits (crash, HUP reload, TTOU)
+# the lock is released and a surviving worker takes over within 15 seconds.
+os.environ.setdefault("SCHEDULER_LOCK_FILE", "data/scheduler.lock")
@@ -1,39 +1,238 @@
+import atexit
+import gzip
+import hashlib
 import logging
+import logging.handlers
 import os
+import queue
 import threading
 import time
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
 
 from pathlib import Path
 
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup; Flask's stdlib provider is used without it
+    orjson = None
+
+try:
+    from flask_compress import Compress
+except ImportError:  # without flask-compress, JSON responses are gzipped with the stdlib below
+    Compress = None
+
+_COMPRESS_MIN_SIZE = 1024
+
+# Resolved once at import rather than on every create_app() call
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+STATIC_FOLDER = str(PROJECT_ROOT / "static")
+_INDEX_PATH = PROJECT_ROOT / "static" / "index.html"
+
+# Loaded before logging is configured so LOG_LEVEL can come from .env
+load_dotenv()
+
+
+try:
+    # Rotation that is safe when several worker processes share one log file
+    from concurrent_log_handler import ConcurrentRotatingFileHandler
+except ImportError:
+    ConcurrentRotatingFileHandler = None
+
+_LOG_FILE = "debug.log"
+_LOG_MAX_BYTES = 50 * 1024 * 1024
+_LOG_BACKUP_COUNT = 5
+_LOG_BUFFER_BYTES = 1 << 17
+# Upper bound on how long a buffered INFO line can sit before reaching disk
+_LOG_FLUSH_SECONDS = 2.0
+
+
+class _BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Appends through a large user-space buffer, flushed for errors, at rollover,
+    periodically by _configure_logging and at shutdown. Single process only:
+    each instance tracks the file size and rotates on its own.
+    """
+
+    def _open(self):
+        stream = open(
+            self.baseFilename,
+            self.mode,
+            buffering=_LOG_BUFFER_BYTES,
+            encoding=self.encoding,
+            errors=self.errors,
+        )
+        # Tracked here because tell() on a text stream would flush the buffer on every record.
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
 
-# Configure logging to BOTH console and file
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('debug.log', mode='w'),
-    ]
-)
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or "utf-8", self.errors or "strict"))
+            if 0 < self._size and self._size + size >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+            if record.levelno >= logging.ERROR:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def _log_file_handler() -> logging.Handler | None:
+    # Append instead of truncating: every worker start used to wipe the file.
+    if ConcurrentRotatingFileHandler is not None:
+        return ConcurrentRotatingFileHandler(
+            _LOG_FILE, mode="a", maxBytes=_LOG_MAX_BYTES, backupCount=_LOG_BACKUP_COUNT,
+            encoding="utf-8", delay=True,
+        )
+    if os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn"):
+        # Several workers rotating one file independently would clobber each
+        # other's backups; without concurrent-log-handler, log to stderr only.
+        return None
+    return _BufferedRotatingFileHandler(
+        _LOG_FILE, mode="a", maxBytes=_LOG_MAX_BYTES, backupCount=_LOG_BACKUP_COUNT,
+        encoding="utf-8", delay=True,
+    )
+
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """Serializes responses with orjson, keeping Flask's fallback for other types."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _configure_logging() -> logging.handlers.QueueListener:
+    # Request threads only enqueue records; one listener thread does the I/O
+    # to BOTH console and file.
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    console_handler = logging.StreamHandler()
+    file_handler = _log_file_handler()
+    handlers = [console_handler] if file_handler is None else [console_handler, file_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    level_name = os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO"
+    try:
+        root.setLevel(level_name)
+        invalid_level = None
+    except ValueError:
+        root.setLevel(logging.INFO)
+        invalid_level = level_name
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    if invalid_level is not None:
+        logging.getLogger(__name__).warning("[LOGGING] Unknown LOG_LEVEL %r, using INFO", invalid_level)
+
+    flush_stop = threading.Event()
+
+    def _flush_periodically():
+        # Keeps buffered lines visible to tail -f and bounds what a SIGKILL can lose
+        while not flush_stop.wait(_LOG_FLUSH_SECONDS):
+            for handler in handlers:
+                handler.flush()
+
+    threading.Thread(target=_flush_periodically, daemon=True, name="LogFlush").start()
+
+    def _shutdown_logging():
+        flush_stop.set()
+        listener.stop()
+        for handler in handlers:
+            handler.close()
+
+    atexit.register(_shutdown_logging)
+    return listener
+
+
+_log_listener = _configure_logging()
 logger = logging.getLogger(__name__)
 
-from execution.breach_check_service import run_breach_check
-from execution.dashboard_view_service import build_dashboard_payload
+from execution.breach_check_service import run_breach_check, validate_email
+from execution.dashboard_view_service import build_dashboard_payload, dashboard_version
 from execution.event_log_and_alert_service import init_db, process_check_result
 from execution.firebase_identity_service import (
     add_monitored_email,
-    get_user_profile,
+    alerts_version,
     get_user_alerts,
     list_monitored_emails,
     remove_monitored_email,
     upsert_user_profile,
     verify_bearer_token,
 )
+from execution.hibp_service import check_email as check_hibp_email
 from execution.risk_response_service import evaluate_risk_and_recommendations
-from execution.scan_scheduler_service import start_scheduler, check_single_email_with_alert
+from execution.scan_scheduler_service import (
+    record_check_alert,
+    start_scheduler,
+    start_scheduler_when_elected,
+)
+
+
+# Fixed error messages whose JSON bodies create_app serializes once
+_FIXED_ERROR_MESSAGES = (
+    "Unable to process breach check",
+    "Email query parameter is required",
+    "Unable to build dashboard",
+    "Unable to fetch profile",
+    "Unable to list monitored emails",
+    "Unable to add monitored email",
+    "Unable to fetch alerts",
+    "Email is required",
+    "Unable to remove monitored email",
+    "Token must include uid and email",
+    "Unable to load user profile",
+)
+
+class ApiError(Exception):
+    """Raised by request handlers; the app's error handler turns it into {"error": message}."""
+
+    code = 500
+
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        if code is not None:
+            self.code = code
+
+
+class AuthError(ApiError):
+    code = 401
+
+
+class FirebaseError(ApiError):
+    code = 500
+
+
+# Shared pool for request handlers that overlap independent blocking calls
+_io_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="RequestIO")
+
+
+def _request_email() -> str:
+    """The JSON body's "email", trimmed and lowercased once for every layer below."""
+    payload = request.get_json(silent=True)
+    email = payload.get("email") if isinstance(payload, dict) else None
+    return email.strip().lower() if isinstance(email, str) else ""
 
 
 def _start_scheduler_thread() -> None:
@@ -41,21 +240,59 @@ def _start_scheduler_thread() -> None:
     monitor_enabled = os.getenv("MONITOR_ENABLED", "true").strip().lower() == "true"
     if not monitor_enabled:
         return
+    # With several server workers, only the one marked SCHEDULER_WORKER=1 scans.
+    # Unset means a single-process run, which always schedules.
+    if os.getenv("SCHEDULER_WORKER", "1").strip() != "1":
+        return
+    # Under gunicorn every worker competes for this lock and the holder schedules.
+    lock_file = os.getenv("SCHEDULER_LOCK_FILE", "").strip()
     try:
-        start_scheduler()
+        if lock_file:
+            start_scheduler_when_elected(lock_file)
+        else:
+            start_scheduler()
     except Exception:
         pass
 
 
+@lru_cache(maxsize=1)
 def create_app() -> Flask:
+    # Memoized: repeated calls (e.g. from tests) reuse the app instead of
+    # registering routes and starting the scheduler again.
     load_dotenv()
-    init_db()
 
-    # Configure static folder path
-    project_root = Path(__file__).resolve().parents[1]
-    static_folder = project_root / "static"
-
-    app = Flask(__name__, static_folder=str(static_folder), static_url_path="/static")
+    # Behind a proxy that serves /static/ itself, SERVE_STATIC=false keeps those
+    # requests off the WSGI workers; the local dev server keeps the mount.
+    serve_static = os.getenv("SERVE_STATIC", "true").strip().lower() == "true"
+    if serve_static:
+        app = Flask(__name__, static_folder=STATIC_FOLDER, static_url_path="/static")
+    else:
+        app = Flask(__name__, static_folder=None)
+    if orjson is not None:
+        app.json = _OrjsonProvider(app)
+
+    if Compress is not None:
+        app.config.setdefault("COMPRESS_MIN_SIZE", _COMPRESS_MIN_SIZE)
+        app.config.setdefault("COMPRESS_ALGORITHM", ["br", "gzip"])
+        Compress(app)
+    else:
+        @app.after_request
+        def gzip_json(response):
+            if (
+                response.status_code != 200
+                or response.direct_passthrough
+                or response.mimetype != "application/json"
+                or "Content-Encoding" in response.headers
+                or not request.accept_encodings["gzip"]  # q-value aware: "gzip;q=0" refuses
+            ):
+                return response
+            data = response.get_data()
+            if len(data) < _COMPRESS_MIN_SIZE:
+                return response
+            response.set_data(gzip.compress(data, compresslevel=6))
+            response.headers["Content-Encoding"] = "gzip"
+            response.vary.add("Accept-Encoding")
+            return response
 
     @app.after_request
     def set_coop_headers(response):
@@ -63,9 +300,14 @@ def create_app() -> Flask:
         response.headers["Cross-Origin-Opener-Policy"] = "same-origin-allow-popups"
         return response
 
+    @app.before_request
+    def ensure_db():
+        # Deferred from startup; a no-op once the schema exists in this process
+        init_db()
+
     @app.before_request
     def log_request():
-        logger.info(f"[REQUEST] {request.method} {request.path}")
+        logger.info("[REQUEST] %s %s", request.method, request.path)
 
     # Test endpoint
     @app.get("/test")
@@ -73,45 +315,126 @@ def create_app() -> Flask:
         logger.info("[TEST] Test endpoint called")
         return jsonify({"status": "ok"}), 200
 
-    # Serve frontend at root
+    # Serve frontend at root from memory: (mtime_ns, body, etag), swapped as one tuple
+    index_cache = [None]
+
+    def _index_entry():
+        entry = index_cache[0]
+        # Production reads the page once; debug re-stats so edits show up without a restart
+        if entry is None or app.debug:
+            mtime = _INDEX_PATH.stat().st_mtime_ns
+            if entry is None or entry[0] != mtime:
+                body = _INDEX_PATH.read_bytes()
+                entry = (mtime, body, hashlib.blake2s(body, digest_size=16).hexdigest())
+                index_cache[0] = entry
+        return entry
+
     @app.get("/")
     def index():
-        return send_from_directory(app.static_folder, "index.html")
-
-    def _auth_error(message: str, code: int = 401):
-        return jsonify({"error": message}), code
+        try:
+            _, body, etag = _index_entry()
+        except FileNotFoundError:
+            return send_from_directory(STATIC_FOLDER, "index.html")
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(body, mimetype="text/html")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
 
-    def _firebase_error(message: str):
-        return jsonify({"error": message}), 500
+    # Bodies for the fixed error messages are serialized once; each call still
+    # gets its own Response, since after_request hooks modify it.
+    error_bodies = {
+        message: app.json.dumps({"error": message}, separators=(",", ":")) + "\n"
+        for message in _FIXED_ERROR_MESSAGES
+    }
+
+    def _error_response(message: str, code: int):
+        body = error_bodies.get(message)
+        if body is None:
+            return jsonify({"error": message}), code
+        return app.response_class(body, status=code, mimetype="application/json")
+
+    @app.errorhandler(ApiError)
+    def handle_api_error(exc):
+        return _error_response(str(exc), exc.code)
+
+    @app.errorhandler(ValueError)
+    def handle_value_error(exc):
+        # Services raise ValueError for invalid client input
+        return jsonify({"error": str(exc)}), 400
+
+    def error_fallback(message: str, client_errors: tuple = (), firebase: bool = False):
+        """Let ApiError and client_errors reach the handlers above; anything else is a 500 with message.
+
+        With firebase=True, a RuntimeError (how the identity service reports a
+        Firebase setup problem) keeps its own message as a FirebaseError.
+        """
+        passthrough = (ApiError, *client_errors)
+        as_firebase = RuntimeError if firebase else ()
+
+        def decorator(handler):
+            @wraps(handler)
+            def wrapper(*args, **kwargs):
+                try:
+                    return handler(*args, **kwargs)
+                except passthrough:
+                    raise
+                except as_firebase as exc:
+                    raise FirebaseError(str(exc)) from exc
+                except Exception as exc:
+                    raise ApiError(message) from exc
+
+            return wrapper
+
+        return decorator
+
+    def _conditional_json(key: str, build):
+        """JSON response with a weak ETag; answers 304 without building when it matches."""
+        etag = hashlib.blake2s(key.encode(), digest_size=16).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(build())
+        response.set_etag(etag, weak=True)
+        # Revalidate on every load (the ETag keeps that a cheap 304), so a
+        # refetch right after a change never shows a cached body.
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
 
     def require_auth(handler):
         @wraps(handler)
         def wrapper(*args, **kwargs):
             auth_header = request.headers.get("Authorization", "")
-            logger.info(f"[AUTH] Request to {request.path}, auth header present: {bool(auth_header)}")
+            # Per-request auth tracing; skipped entirely unless LOG_LEVEL=DEBUG
+            auth_debug = logger.isEnabledFor(logging.DEBUG)
+            if auth_debug:
+                logger.debug("[AUTH] Request to %s, auth header present: %s", request.path, bool(auth_header))
             try:
                 decoded = verify_bearer_token(auth_header)
-                logger.info(f"[AUTH] Token verified for uid: {decoded.get('uid')}")
+                if auth_debug:
+                    logger.debug("[AUTH] Token verified for uid: %s", decoded.get('uid'))
             except ValueError as exc:
-                logger.error(f"[AUTH] ValueError: {exc}")
-                return _auth_error(str(exc), 401)
+                logger.error("[AUTH] ValueError: %s", exc)
+                raise AuthError(str(exc)) from exc
             except Exception as exc:
-                logger.error(f"[AUTH] Token verification failed: {type(exc).__name__}: {exc}")
-                return _auth_error(f"Token error: {str(exc)}", 401)
+                logger.error("[AUTH] Token verification failed: %s: %s", type(exc).__name__, exc)
+                raise AuthError(f"Token error: {str(exc)}") from exc
 
             uid = decoded.get("uid", "")
             email = decoded.get("email", "")
             display_name = decoded.get("name", "")
 
             if not uid or not email:
-                return _auth_error("Token must include uid and email", 401)
+                raise AuthError("Token must include uid and email")
 
             try:
                 profile = upsert_user_profile(uid, email, display_name)
             except RuntimeError as exc:
-                return _firebase_error(str(exc))
-            except Exception:
-                return _firebase_error("Unable to load user profile")
+                raise FirebaseError(str(exc)) from exc
+            except Exception as exc:
+                raise FirebaseError("Unable to load user profile") from exc
 
             request.user = {
                 "uid": uid,
@@ -124,18 +447,13 @@ def create_app() -> Flask:
         return wrapper
 
     @app.post("/check-email")
+    @error_fallback("Unable to process breach check", client_errors=(ValueError,))
     def check_email():
-        payload = request.get_json(silent=True) or {}
-        email = payload.get("email", "")
+        email = _request_email()
 
-        try:
-            check_result = run_breach_check(email)
-            scored = evaluate_risk_and_recommendations(check_result)
-            event_result = process_check_result(scored)
-        except ValueError as exc:
-            return jsonify({"error": str(exc)}), 400
-        except Exception:
-            return jsonify({"error": "Unable to process breach check"}), 500
+        check_result = run_breach_check(email)
+        scored = evaluate_risk_and_recommendations(check_result)
+        event_result = process_check_result(scored)
 
         response = {
             "email": scored["email"],
@@ -150,16 +468,14 @@ def create_app() -> Flask:
         return jsonify(response), 200
 
     @app.get("/dashboard")
+    @error_fallback("Unable to build dashboard")
     def dashboard():
         email = request.args.get("email", "").strip().lower()
         if not email:
-            return jsonify({"error": "Email query parameter is required"}), 400
+            return _error_response("Email query parameter is required", 400)
 
-        try:
-            result = build_dashboard_payload(email)
-        except Exception:
-            return jsonify({"error": "Unable to build dashboard"}), 500
-        return jsonify(result), 200
+        version = dashboard_version(email)
+        return _conditional_json(f"dashboard:{email}:{version}", lambda: build_dashboard_payload(email))
 
     @app.get("/auth/me")
     @require_auth
@@ -178,97 +494,77 @@ def create_app() -> Flask:
 
     @app.get("/user/profile")
     @require_auth
+    @error_fallback("Unable to fetch profile", firebase=True)
     def user_profile():
-        try:
-            profile = get_user_profile(request.user["uid"]) or request.user["profile"]
-            return (
-                jsonify(
-                    {
-                        "uid": request.user["uid"],
-                        "email": profile.get("email", request.user["email"]),
-                        "monitoredEmails": profile.get("monitoredEmails", []),
-                    }
-                ),
-                200,
-            )
-        except RuntimeError as exc:
-            return _firebase_error(str(exc))
-        except Exception:
-            return jsonify({"error": "Unable to fetch profile"}), 500
+        # require_auth read (or created) the profile from Firestore for this request
+        profile = request.user["profile"]
+        return (
+            jsonify(
+                {
+                    "uid": request.user["uid"],
+                    "email": profile.get("email", request.user["email"]),
+                    "monitoredEmails": profile.get("monitoredEmails", []),
+                }
+            ),
+            200,
+        )
 
     @app.get("/user/emails")
     @require_auth
+    @error_fallback("Unable to list monitored emails", firebase=True)
     def user_emails_list():
-        try:
-            emails = list_monitored_emails(request.user["uid"])
-            return jsonify(emails), 200
-        except RuntimeError as exc:
-            return _firebase_error(str(exc))
-        except Exception:
-            return jsonify({"error": "Unable to list monitored emails"}), 500
+        emails = list_monitored_emails(request.user["uid"])
+        return jsonify(emails), 200
 
     @app.post("/user/emails")
     @require_auth
+    @error_fallback("Unable to add monitored email", client_errors=(ValueError,), firebase=True)
     def user_emails_add():
-        payload = request.get_json(silent=True) or {}
-        email = payload.get("email", "")
+        email = _request_email()
+        normalized_email = validate_email(email)
+        uid = request.user["uid"]
+
+        # Phase 3: Immediate breach check on add. Only the read-only HIBP lookup
+        # overlaps the Firestore write; the alert and email wait for the add to succeed.
+        check_future = _io_pool.submit(check_hibp_email, normalized_email)
+        updated = add_monitored_email(uid, normalized_email)
+
+        breach_result = None
         try:
-            updated = add_monitored_email(request.user["uid"], email)
-            
-            # Phase 3: Immediate breach check on add
-            breach_result = None
-            try:
-                breach_result = check_single_email_with_alert(
-                    request.user["uid"],
-                    request.user["email"],
-                    email.strip().lower()
-                )
-            except Exception:
-                pass  # Don't fail the add if check fails
-            
-            response = {
-                "emails": updated,
-                "breach_check": breach_result,
-            }
-            return jsonify(response), 200
-        except ValueError as exc:
-            return jsonify({"error": str(exc)}), 400
-        except RuntimeError as exc:
-            return _firebase_error(str(exc))
+            breach_result = record_check_alert(
+                uid, request.user["email"], normalized_email, check_future.result()
+            )
         except Exception:
-            return jsonify({"error": "Unable to add monitored email"}), 500
+            pass  # Don't fail the add if check fails
+
+        response = {
+            "emails": updated,
+            "breach_check": breach_result,
+        }
+        return jsonify(response), 200
 
     @app.get("/user/alerts")
     @require_auth
+    @error_fallback("Unable to fetch alerts", firebase=True)
     def user_alerts_list():
         """Get all breach alerts for the current user."""
-        try:
-            alerts = get_user_alerts(request.user["uid"])
-            return jsonify(alerts), 200
-        except RuntimeError as exc:
-            return _firebase_error(str(exc))
-        except Exception:
-            return jsonify({"error": "Unable to fetch alerts"}), 500
+        uid = request.user["uid"]
+        alerts = get_user_alerts(uid)
+        return _conditional_json(f"alerts:{uid}:{alerts_version(alerts)}", lambda: alerts)
 
     @app.delete("/user/emails")
     @require_auth
+    @error_fallback("Unable to remove monitored email", client_errors=(ValueError,), firebase=True)
     def user_emails_delete():
-        payload = request.get_json(silent=True) or {}
-        email = payload.get("email", "")
+        email = _request_email()
         if not email:
-            return jsonify({"error": "Email is required"}), 400
+            return _error_response("Email is required", 400)
 
         try:
             updated = remove_monitored_email(request.user["uid"], email)
-            return jsonify(updated), 200
-        except ValueError as exc:
-            return jsonify({"error": str(exc)}), 400
         except LookupError as exc:
-            return jsonify({"error": str(exc)}), 404
-        except RuntimeError as exc:
-            return _firebase_error(str(exc))
-        except Exception:
-            return jsonify({"error": "Unable to remove monitored email"}), 500
+            raise ApiError(str(exc), 404) from exc
+        return jsonify(updated), 200
 
     _start_scheduler_thread()
     return app